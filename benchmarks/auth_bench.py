@@ -0,0 +1,53 @@
+"""Measure per-request auth overhead of ``deps.get_current_user``.
+
+Compares the previous implementation (HTTPBearer, ``os.getenv`` and a full
+HS256 decode on every call) with the cached fast path.
+
+    python -m benchmarks.auth_bench --calls 20000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import jwt
+from fastapi.security import HTTPBearer
+
+from server.app import deps
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def legacy_get_current_user(request):
+    credentials = await _bearer(request)
+    token = credentials.credentials if credentials else request.cookies.get("access_token")
+    return jwt.decode(token, os.getenv("JWT_SECRET"), algorithms=["HS256"])
+
+
+async def _time(fn, request, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        await fn(request)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    from starlette.requests import Request
+
+    os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+    deps.load_keys()
+    token = deps.issue_token({"sub": "user1", "email": "a@example.com", "exp": time.time() + 3600})
+    request = Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+    legacy = asyncio.run(_time(legacy_get_current_user, request, args.calls))
+    fast = asyncio.run(_time(deps.get_current_user, request, args.calls))
+    print(f"legacy:    {legacy:7.2f} us/request")
+    print(f"fast path: {fast:7.2f} us/request ({legacy / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
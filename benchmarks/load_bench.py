@@ -0,0 +1,278 @@
+"""Drive concurrent load at the API hot paths and record latency percentiles.
+
+Runs the real FastAPI ``app`` in process (lifespan included) against local
+stand-ins: an in-memory database, a fake Plant.id client with configurable
+latency and the filesystem storage backend. Each endpoint is loaded in its
+own phase; results are printed and written as JSON so runs from different
+commits can be compared.
+
+    python -m benchmarks.load_bench --concurrency 32 --requests 500
+    python -m benchmarks.load_bench --compare benchmarks/results/<old>.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime, timezone
+from pathlib import Path
+
+os.environ.setdefault("PLANT_ID_API_KEY", "benchmark")
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+# Measure the pipeline itself, not Plant.id admission control
+for _name in ("IDENTIFY_USER_RATE_PER_MINUTE", "IDENTIFY_GLOBAL_RATE_PER_MINUTE", "IDENTIFY_MAX_QUEUED"):
+    os.environ.setdefault(_name, "0")
+
+import httpx
+from bson import ObjectId
+from PIL import Image
+
+from server.app import deps, main as app_main, routes, storage
+from benchmarks.memory_db import MemoryDatabase
+
+ENDPOINTS = ("identify-plant", "my-plants", "count", "delete-plant")
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+class FakePlantApi:
+    """Answers like ``kindwise.PlantApi.identify`` after ``latency`` seconds."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def identify(self, images, **kwargs):
+        time.sleep(self.latency)
+        suggestion = types.SimpleNamespace(
+            id="bench-species",
+            name="ficus lyrata",
+            probability=0.93,
+            details={
+                "common_names": ["fiddle-leaf fig"],
+                "synonyms": ["ficus pandurata"],
+                "description": {"value": "A fig with large, violin shaped leaves."},
+            },
+            similar_images=[],
+        )
+        return types.SimpleNamespace(
+            access_token="bench",
+            status=types.SimpleNamespace(name="COMPLETED"),
+            result=types.SimpleNamespace(
+                is_plant=types.SimpleNamespace(binary=True, probability=0.99),
+                classification=types.SimpleNamespace(suggestions=[suggestion]),
+            ),
+            input=types.SimpleNamespace(datetime=datetime.now(timezone.utc), latitude=51.5, longitude=-0.1),
+        )
+
+
+def _jpeg(index: int, size) -> bytes:
+    # A distinct colour per request keeps identification cache hits out of the numbers
+    buf = io.BytesIO()
+    Image.new("RGB", size, (index % 256, (index // 256) % 256, 90)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _seed(db: MemoryDatabase, users, plants_per_user: int):
+    """Insert plant documents shaped like the ones the identify route writes."""
+    ids = {}
+    for user in users:
+        ids[user] = []
+        for i in range(plants_per_user):
+            oid = ObjectId()
+            db.plants._add({
+                "_id": oid,
+                "user_id": user,
+                "notes": "",
+                "datetime": "2024-01-01 00:00:00",
+                "suggestions": [{
+                    "id": "bench-species", "name": f"Ficus {i}",
+                    "common_names": ["Fiddle-Leaf Fig"], "probability": 0.9, "similar_images": [],
+                }],
+                "image_urls": [f"https://bench.invalid/plants/{oid}.jpg"],
+                "images_owned": False,
+            })
+            ids[user].append(str(oid))
+    return ids
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(values) / len(values)) if values else 0.0,
+            "p50": ms(percentile(values, 50)),
+            "p95": ms(percentile(values, 95)),
+            "p99": ms(percentile(values, 99)),
+            "max": ms(values[-1]) if values else 0.0,
+        },
+    }
+
+
+async def _phase(client: httpx.AsyncClient, make_request, total: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < total:
+            n = issued
+            issued += 1
+            method, url, kwargs = make_request(n)
+            start = time.perf_counter()
+            resp = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if resp.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run(args) -> dict:
+    db = MemoryDatabase(latency=args.db_latency)
+    app_main.db = routes.db = db
+    routes.plant_client = FakePlantApi(args.plant_id_latency)
+
+    users = [f"bench-user-{i}" for i in range(args.users)]
+    seeded = _seed(db, users, args.plants_per_user)
+    deps.load_keys()
+    exp = time.time() + 3600
+    headers = {
+        u: {"Authorization": "Bearer " + deps.issue_token({"sub": u, "email": f"{u}@example.com", "exp": exp})}
+        for u in users
+    }
+    images = [_jpeg(i, (args.image_width, args.image_height)) for i in range(args.requests)]
+
+    def user_for(n):
+        return users[n % len(users)]
+
+    def identify(n):
+        user = user_for(n)
+        return "POST", "/api/identify-plant", {
+            "headers": headers[user],
+            "files": [("images", ("plant.jpg", images[n], "image/jpeg"))],
+            "data": {"latitude": "51.5", "longitude": "-0.1"},
+        }
+
+    def my_plants(n):
+        user = user_for(n)
+        return "GET", "/api/my-plants", {
+            "headers": headers[user], "params": {"view": "summary", "limit": args.page_size},
+        }
+
+    def count(n):
+        user = user_for(n)
+        return "GET", "/api/my-plants/count", {"headers": headers[user]}
+
+    def delete(n):
+        user = user_for(n)
+        return "DELETE", f"/api/delete-plant/{seeded[user].pop()}", {"headers": headers[user]}
+
+    phases = {"identify-plant": identify, "my-plants": my_plants, "count": count, "delete-plant": delete}
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        storage.set_backend(storage.LocalBackend(root, "https://bench.invalid"))
+        try:
+            async with app_main.app.router.lifespan_context(app_main.app):
+                transport = httpx.ASGITransport(app=app_main.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                    for name in args.endpoints:
+                        total = args.requests
+                        if name == "delete-plant":
+                            total = min(total, sum(len(v) for v in seeded.values()))
+                        results[name] = await _phase(client, phases[name], total, args.concurrency)
+        finally:
+            storage.set_backend(None)
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict):
+    print(f"\nvs. {baseline['meta'].get('commit', '?')}:")
+    for name, now in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        def delta(a, b):
+            return f"{(a - b) / b * 100:+6.1f}%" if b else "   n/a"
+        print(
+            f"  {name:15s} rps {delta(now['throughput_rps'], before['throughput_rps'])}"
+            f"  p50 {delta(now['latency_ms']['p50'], before['latency_ms']['p50'])}"
+            f"  p95 {delta(now['latency_ms']['p95'], before['latency_ms']['p95'])}"
+            f"  p99 {delta(now['latency_ms']['p99'], before['latency_ms']['p99'])}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--plants-per-user", type=int, default=500)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--plant-id-latency", type=float, default=0.2, help="seconds per Plant.id call")
+    parser.add_argument("--db-latency", type=float, default=0.001, help="seconds per database call")
+    parser.add_argument("--image-width", type=int, default=1600)
+    parser.add_argument("--image-height", type=int, default=1200)
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    args = parser.parse_args(argv)
+
+    endpoints = asyncio.run(run(args))
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "endpoints": endpoints,
+    }
+
+    for name, r in endpoints.items():
+        lat = r["latency_ms"]
+        print(
+            f"{name:15s} {r['throughput_rps']:8.1f} req/s  p50 {lat['p50']:8.2f}ms"
+            f"  p95 {lat['p95']:8.2f}ms  p99 {lat['p99']:8.2f}ms  errors {r['errors']}"
+        )
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"results written to {output}")
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""In-memory stand-in for the Motor database used by the benchmarks.
+
+Implements only the collection methods and query operators the app calls,
+so the real routes run unmodified without a MongoDB server. Documents are
+bucketed by ``user_id`` the way the compound indexes would narrow a query;
+``latency`` adds a simulated round trip to every call.
+"""
+import asyncio
+import copy
+import re
+import types
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+def _get(doc: Dict[str, Any], path: str):
+    value: Any = doc
+    for part in path.split("."):
+        if isinstance(value, list):
+            value = [v.get(part) if isinstance(v, dict) else None for v in value]
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return None
+    return value
+
+
+def _compare(op: str, value, arg) -> bool:
+    if op == "$eq":
+        return value == arg or (isinstance(value, list) and arg in value)
+    if op == "$ne":
+        return not _compare("$eq", value, arg)
+    if op == "$in":
+        return any(_compare("$eq", value, a) for a in arg)
+    if op == "$exists":
+        return (value is not None) == bool(arg)
+    if op == "$regex":
+        values = value if isinstance(value, list) else [value]
+        return any(isinstance(v, str) and re.search(arg, v) for v in values)
+    if op == "$not":
+        return not all(_compare(o, value, a) for o, a in arg.items())
+    if op == "$type":
+        return isinstance(value, (int, float)) if arg == "number" else value is not None
+    if value is None:
+        return False
+    try:
+        return {
+            "$lt": value < arg, "$lte": value <= arg,
+            "$gt": value > arg, "$gte": value >= arg,
+        }[op]
+    except TypeError:
+        return False
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(matches(doc, q) for q in cond):
+                return False
+            continue
+        if key == "$text":
+            words = cond["$search"].lower().split()
+            text = f"{doc.get('search_names', '')} {doc.get('notes') or ''}".lower()
+            if not any(w in text for w in words):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            for op, arg in cond.items():
+                if op in ("$geoWithin", "$near"):
+                    continue
+                if not _compare(op, value, arg):
+                    return False
+        elif not _compare("$eq", value, cond):
+            return False
+    return True
+
+
+def _evaluate(doc: Dict[str, Any], expr):
+    if isinstance(expr, str) and expr.startswith("$"):
+        return _get(doc, expr[1:])
+    if isinstance(expr, dict) and "$arrayElemAt" in expr:
+        array, index = (_evaluate(doc, e) for e in expr["$arrayElemAt"])
+        return array[index] if isinstance(array, list) and len(array) > index else None
+    if isinstance(expr, dict) and "$ifNull" in expr:
+        return next((v for v in (_evaluate(doc, e) for e in expr["$ifNull"]) if v is not None), None)
+    if isinstance(expr, dict) and "$meta" in expr:
+        return 1.0
+    return expr
+
+
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(doc)
+    if all(v == 0 for v in projection.values()):
+        return {k: copy.deepcopy(v) for k, v in doc.items() if k not in projection}
+    out = {"_id": doc.get("_id")} if projection.get("_id", 1) else {}
+    for key, expr in projection.items():
+        if key == "_id":
+            continue
+        if expr in (1, True):
+            if key in doc:
+                out[key] = copy.deepcopy(doc[key])
+        else:
+            out[key] = _evaluate(doc, expr)
+    return out
+
+
+def apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool = False):
+    for key, value in update.get("$set", {}).items():
+        doc[key] = value
+    for key, delta in update.get("$inc", {}).items():
+        doc[key] = doc.get(key, 0) + delta
+    if inserting:
+        doc.update(update.get("$setOnInsert", {}))
+    return doc
+
+
+def _sort_key(value):
+    # Mixed types (e.g. missing fields) sort first instead of raising
+    return (value is not None, str(type(value)), value if value is not None else 0)
+
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[tuple] = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=1):
+        self._sort = key if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def skip(self, n: int):
+        self._skip = n
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    def _results(self) -> List[Dict[str, Any]]:
+        docs = self._collection.matching(self._query)
+        for key, direction in reversed(self._sort):
+            if isinstance(direction, dict):  # {"$meta": "textScore"}
+                continue
+            docs.sort(key=lambda d: _sort_key(d.get(key)), reverse=direction < 0)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [project(d, self._projection) for d in docs]
+
+    async def to_list(self, length: Optional[int] = None):
+        await self._collection.round_trip()
+        docs = self._results()
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._collection.round_trip()
+        for doc in self._results():
+            yield doc
+
+
+class _AggregateCursor:
+    def __init__(self, collection: "MemoryCollection", pipeline):
+        self._collection = collection
+        self._pipeline = pipeline
+
+    def _results(self):
+        docs = self._collection.matching({})
+        for stage in self._pipeline:
+            (op, arg), = stage.items()
+            if op == "$match":
+                docs = [d for d in docs if matches(d, arg)]
+            elif op == "$geoNear":
+                docs = [dict(d, **{arg["distanceField"]: 0.0}) for d in docs if matches(d, arg.get("query", {}))]
+            elif op == "$limit":
+                docs = docs[:arg]
+            elif op == "$project":
+                docs = [project(d, arg) for d in docs]
+            elif op == "$group":
+                groups: Dict[Any, Dict[str, Any]] = {}
+                for d in docs:
+                    gid = _evaluate(d, arg["_id"])
+                    row = groups.setdefault(gid, {"_id": gid})
+                    for field, acc in arg.items():
+                        if field != "_id":
+                            row[field] = row.get(field, 0) + _evaluate(d, acc["$sum"])
+                docs = list(groups.values())
+            else:
+                raise NotImplementedError(f"aggregation stage {op}")
+        return docs
+
+    async def to_list(self, length: Optional[int] = None):
+        await self._collection.round_trip()
+        docs = self._results()
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._collection.round_trip()
+        for doc in self._results():
+            yield doc
+
+
+class MemoryCollection:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        self._by_user: Dict[Any, Dict[Any, Dict[str, Any]]] = {}
+
+    async def round_trip(self):
+        await asyncio.sleep(self.latency)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _bucket(self, query) -> Iterable[Dict[str, Any]]:
+        user = query.get("user_id")
+        if user is not None and not isinstance(user, dict):
+            return self._by_user.get(user, {}).values()
+        key = query.get("_id")
+        if key is not None and not isinstance(key, dict):
+            doc = self._docs.get(key)
+            return [doc] if doc is not None else []
+        return self._docs.values()
+
+    def matching(self, query) -> List[Dict[str, Any]]:
+        return [d for d in self._bucket(query) if matches(d, query)]
+
+    def _add(self, doc):
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"duplicate key {doc['_id']!r}")
+        self._docs[doc["_id"]] = doc
+        self._by_user.setdefault(doc.get("user_id"), {})[doc["_id"]] = doc
+        return doc["_id"]
+
+    def _remove(self, doc):
+        self._docs.pop(doc["_id"], None)
+        self._by_user.get(doc.get("user_id"), {}).pop(doc["_id"], None)
+
+    def _upsert(self, query, update):
+        seed = {k: v for k, v in query.items() if not isinstance(v, dict)}
+        doc = apply_update(seed, update, inserting=True)
+        self._add(doc)
+        return doc
+
+    # --- Motor API -------------------------------------------------------
+    async def create_index(self, *args, **kwargs):
+        return kwargs.get("name", "index")
+
+    def find(self, query=None, projection=None):
+        return MemoryCursor(self, query or {}, projection)
+
+    def aggregate(self, pipeline):
+        return _AggregateCursor(self, pipeline)
+
+    async def find_one(self, query=None, projection=None):
+        await self.round_trip()
+        found = self.matching(query or {})
+        return project(found[0], projection) if found else None
+
+    async def count_documents(self, query):
+        await self.round_trip()
+        return len(self.matching(query))
+
+    async def insert_one(self, doc):
+        await self.round_trip()
+        return types.SimpleNamespace(inserted_id=self._add(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        await self.round_trip()
+        return types.SimpleNamespace(inserted_ids=[self._add(d) for d in docs])
+
+    async def update_one(self, query, update, upsert=False):
+        await self.round_trip()
+        found = self.matching(query)[:1]
+        for doc in found:
+            apply_update(doc, update)
+        if not found and upsert:
+            self._upsert(query, update)
+        return types.SimpleNamespace(matched_count=len(found), modified_count=len(found))
+
+    async def update_many(self, query, update):
+        await self.round_trip()
+        found = self.matching(query)
+        for doc in found:
+            apply_update(doc, update)
+        return types.SimpleNamespace(matched_count=len(found), modified_count=len(found))
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE):
+        await self.round_trip()
+        found = self.matching(query)[:1]
+        if not found:
+            if not upsert:
+                return None
+            doc = self._upsert(query, update)
+            return project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        doc = found[0]
+        before = project(doc, projection)
+        apply_update(doc, update)
+        return project(doc, projection) if return_document == ReturnDocument.AFTER else before
+
+    async def delete_one(self, query):
+        await self.round_trip()
+        found = self.matching(query)[:1]
+        for doc in found:
+            self._remove(doc)
+        return types.SimpleNamespace(deleted_count=len(found))
+
+    async def delete_many(self, query):
+        await self.round_trip()
+        found = self.matching(query)
+        for doc in found:
+            self._remove(doc)
+        return types.SimpleNamespace(deleted_count=len(found))
+
+    async def bulk_write(self, ops, ordered=True):
+        await self.round_trip()
+        for op in ops:
+            found = self.matching(op._filter)[:1]
+            for doc in found:
+                apply_update(doc, op._doc)
+            if not found and op._upsert:
+                self._upsert(op._filter, op._doc)
+        return types.SimpleNamespace(acknowledged=True)
+
+
+class _Admin:
+    async def command(self, *args, **kwargs):
+        return {"ok": 1}
+
+
+class MemoryDatabase:
+    """Creates collections on first access, like ``motor`` does."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.client = types.SimpleNamespace(admin=_Admin())
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self.latency)
+        return self._collections[name]
+
+    __getitem__ = __getattr__
+
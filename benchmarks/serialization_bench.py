@@ -0,0 +1,107 @@
+"""Compare validated vs. trusted serialization of a page of plant documents.
+
+The validated path is what ``get_plants`` used to do: ``PlantResponse(**doc)``
+per document, ``jsonable_encoder`` and ``json.dumps``. The trusted path
+reshapes stored documents with ``serialization.trusted_dump`` and encodes
+them with orjson.
+
+    python -m benchmarks.serialization_bench --page-size 100 --suggestions 5
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("PLANT_ID_API_KEY", "benchmark")
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from server.app import serialization
+from server.app.models import PlantResponse
+
+
+def _document(suggestions: int, similar_images: int) -> dict:
+    oid = ObjectId()
+    return {
+        "_id": oid,
+        "id": str(oid),
+        "user_id": "bench-user",
+        "access_token": "tok",
+        "is_plant_boolean": True,
+        "is_plant_probability": 0.99,
+        "notes": "Water when the top inch of soil is dry. " * 5,
+        "datetime": "2024-01-01 00:00:00",
+        "latitude": 51.5,
+        "longitude": -0.1,
+        "image_urls": [f"https://cdn.example.com/plants/{oid}-{i}.jpg" for i in range(3)],
+        "renditions": [
+            {"original": f"https://cdn.example.com/plants/{oid}-{i}.jpg",
+             "medium": f"https://cdn.example.com/plants/medium/{oid}-{i}.jpg",
+             "thumbnail": f"https://cdn.example.com/plants/thumbnail/{oid}-{i}.jpg"}
+            for i in range(3)
+        ],
+        "suggestions": [
+            {
+                "id": f"species-{s}",
+                "name": f"Ficus Lyrata {s}",
+                "probability": 0.9 / (s + 1),
+                "common_names": ["Fiddle-Leaf Fig", "Banjo Fig"],
+                "taxonomy": {"kingdom": "Plantae", "family": "Moraceae", "genus": "Ficus"},
+                "url": "https://en.wikipedia.org/wiki/Ficus_lyrata",
+                "description": "A species of flowering plant in the mulberry and fig family. " * 8,
+                "synonyms": ["Ficus pandurata", "Ficus lyrata var. pandurata"],
+                "edible_parts": None,
+                "watering": {"min": 2, "max": 2},
+                "propagation_methods": ["cuttings", "seeds"],
+                "best_light_condition": "Bright, indirect light. " * 4,
+                "best_soil_type": "Well-draining potting mix. " * 4,
+                "cultural_significance": "Popular indoor plant. " * 4,
+                "best_watering": "Water thoroughly, then let dry. " * 4,
+                "similar_images": [
+                    {"url": f"https://plant.id/media/images/{s}-{i}.jpg", "similarity": 0.8}
+                    for i in range(similar_images)
+                ],
+            }
+            for s in range(suggestions)
+        ],
+    }
+
+
+def validated(docs):
+    return json.dumps(jsonable_encoder([PlantResponse(**d) for d in docs]), separators=(",", ":")).encode()
+
+
+def trusted(docs):
+    return serialization.dumps([serialization.trusted_dump(PlantResponse, d) for d in docs])
+
+
+def _time(fn, docs, rounds):
+    fn(docs)  # warm caches
+    start = time.perf_counter()
+    for _ in range(rounds):
+        body = fn(docs)
+    return (time.perf_counter() - start) / rounds * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--suggestions", type=int, default=5)
+    parser.add_argument("--similar-images", type=int, default=2)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    docs = [_document(args.suggestions, args.similar_images) for _ in range(args.page_size)]
+    assert json.loads(validated(docs)) == json.loads(trusted(docs)), "outputs differ"
+
+    slow, size = _time(validated, docs, args.rounds)
+    fast, _ = _time(trusted, docs, args.rounds)
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    print(f"page of {args.page_size} documents, {size / 1024:.0f} KiB")
+    print(f"validated:        {slow:8.2f} ms/page")
+    print(f"trusted+{encoder:8s} {fast:8.2f} ms/page ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Measure cold start: import time, lifespan start-up and time to first response.
+
+Each run starts a fresh interpreter so module imports are really cold. The
+app runs against the in-memory database and local storage, so only the
+app's own start-up work is measured, not network round trips.
+
+    python -m benchmarks.startup_bench --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def child():
+    import time
+
+    start = time.perf_counter()
+    os.environ.setdefault("PLANT_ID_API_KEY", "benchmark")
+    os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+    from server.app import main, routes, storage
+    imported = time.perf_counter()
+
+    import asyncio
+    import tempfile
+
+    import httpx
+    from benchmarks.memory_db import MemoryDatabase
+
+    async def serve_first_request():
+        main.db = routes.db = MemoryDatabase()
+        with tempfile.TemporaryDirectory() as root:
+            storage.set_backend(storage.LocalBackend(root))
+            async with main.app.router.lifespan_context(main.app):
+                started = time.perf_counter()
+                transport = httpx.ASGITransport(app=main.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                    resp = await client.get("/api/metrics")
+                    resp.raise_for_status()
+                return started, time.perf_counter()
+
+    started, answered = asyncio.run(serve_first_request())
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000,
+        "lifespan_ms": (started - imported) * 1000,
+        "first_response_ms": (answered - started) * 1000,
+        "total_ms": (answered - start) * 1000,
+    }))
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/startup-<commit>.json)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup_bench", "--child"],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+
+    summary = {}
+    for key in runs[0]:
+        values = [r[key] for r in runs]
+        summary[key] = {"median": round(statistics.median(values), 1), "min": round(min(values), 1)}
+        print(f"{key:18s} median {summary[key]['median']:8.1f}ms  min {summary[key]['min']:8.1f}ms")
+
+    commit = _git_commit()
+    output = Path(args.output) if args.output else RESULTS_DIR / f"startup-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"commit": commit, "runs": args.runs, "summary": summary}, indent=2) + "\n")
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
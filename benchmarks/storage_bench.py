@@ -0,0 +1,84 @@
+"""Compare sequential vs. parallel image uploads against a storage backend.
+
+Runs offline against the local filesystem backend by default; ``--latency``
+adds a fake per-call round trip so the effect of parallelism is visible.
+Keys are content hashes, so every upload gets distinct bytes; re-uploading
+an already stored batch is measured separately as ``deduplicated``.
+
+    python -m benchmarks.storage_bench --images 5 --rounds 20 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from server.app import storage
+
+
+class SlowBackend(storage.LocalBackend):
+    def __init__(self, root, latency):
+        super().__init__(root)
+        self.latency = latency
+
+    def put(self, key, data, content_type):
+        time.sleep(self.latency)
+        super().put(key, data, content_type)
+
+    def exists(self, key):
+        time.sleep(self.latency)
+        return super().exists(key)
+
+
+def _batch(images, tag: str):
+    """The images with a unique suffix, so none of them is already stored."""
+    return [(data + tag.encode() + bytes([i]), ct) for i, (data, ct) in enumerate(images)]
+
+
+async def _run(images, rounds):
+    batches = [_batch(images, f"s{r}") for r in range(rounds)]
+    start = time.perf_counter()
+    for batch in batches:
+        for data, ct in batch:
+            storage.upload_image_bytes(data, ct)
+    sequential = time.perf_counter() - start
+
+    batches = [_batch(images, f"p{r}") for r in range(rounds)]
+    start = time.perf_counter()
+    for batch in batches:
+        await storage.upload_images(batch)
+    parallel = time.perf_counter() - start
+
+    # Same bytes again: only existence checks, no uploads
+    start = time.perf_counter()
+    for batch in batches:
+        await storage.upload_images(batch)
+    deduplicated = time.perf_counter() - start
+    return sequential, parallel, deduplicated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=5)
+    parser.add_argument("--size", type=int, default=2_000_000, help="bytes per image")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per call")
+    args = parser.parse_args()
+
+    images = [(os.urandom(args.size), "image/jpeg") for _ in range(args.images)]
+    with tempfile.TemporaryDirectory() as root:
+        storage.set_backend(SlowBackend(root, args.latency))
+        try:
+            sequential, parallel, deduplicated = asyncio.run(_run(images, args.rounds))
+        finally:
+            storage.shutdown()
+            storage.set_backend(None)
+
+    total = args.images * args.rounds
+    print(f"sequential: {total / sequential:8.1f} images/s ({sequential:.2f}s)")
+    print(f"parallel:   {total / parallel:8.1f} images/s ({parallel:.2f}s)")
+    print(f"deduplicated: {total / deduplicated:6.1f} images/s ({deduplicated:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
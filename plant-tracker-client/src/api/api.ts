@@ -44,9 +44,22 @@ export async function identifyPlant(
   if (latitude !== undefined) formData.append('latitude', String(latitude));
   if (longitude !== undefined) formData.append('longitude', String(longitude));
 
-  const response = await apiClient.post<ApiPlantResponse>('/identify-plant', formData, {
-    headers: { 'Content-Type': undefined },
-  });
+  let response;
+  try {
+    response = await apiClient.post<ApiPlantResponse>('/identify-plant', formData, {
+      headers: { 'Content-Type': undefined },
+    });
+  } catch (error) {
+    // Rate limited or the server is shedding load: tell the user when to retry
+    if (axios.isAxiosError(error) && error.response?.status === 429) {
+      const retryAfter = error.response.headers['retry-after'];
+      toast({
+        description: `Too many identifications right now. Try again in ${retryAfter ?? 'a few'} seconds.`,
+      });
+      return;
+    }
+    throw error;
+  }
   const resp = response.data
   // It's good practice to check if suggestions exist
   if (!resp.suggestions || resp.suggestions.length === 0) {
@@ -59,6 +72,7 @@ export async function identifyPlant(
   const newIdentification: IdentifiedPlant = {
     id: resp.id || topSuggestion.id || Date.now().toString(),
     image_urls: resp.image_urls?.length ? resp.image_urls : (resp.image_data || []),
+    thumbnail_urls: resp.renditions?.map((r) => r.thumbnail ?? r.original),
     plantName: topSuggestion.common_names?.[0] || topSuggestion.name, // Prefer common name, fallback to scientific
     scientificName: topSuggestion.name, // Always store the scientific name
     confidence: Math.round(topSuggestion.probability * 100),
@@ -91,6 +105,7 @@ function mapResponseToPlant(resp: ApiPlantResponse): IdentifiedPlant | null {
   return {
     id: resp.id || topSuggestion.id || resp.datetime || Date.now().toString(),
     image_urls: resp.image_urls?.length ? resp.image_urls : (resp.image_data || []),
+    thumbnail_urls: resp.renditions?.map((r) => r.thumbnail ?? r.original),
     plantName: topSuggestion.common_names?.[0] || topSuggestion.name,
     scientificName: topSuggestion.name,
     confidence: Math.round(topSuggestion.probability * 100),
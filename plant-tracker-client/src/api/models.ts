@@ -26,6 +26,13 @@ export interface Suggestion {
   similar_images?: SimilarImage[];
 }
 
+/** Stored copies of one uploaded photo at different sizes. */
+export interface ImageRenditions {
+  original: string;
+  medium?: string;
+  thumbnail?: string;
+}
+
 /**
  * Represents the raw response from the `identifyPlant` API endpoint.
  */
@@ -41,6 +48,7 @@ export interface ApiPlantResponse {
   latitude?: number;
   longitude?: number;
   image_urls?: string[];
+  renditions?: ImageRenditions[];
   image_data?: string[];
 }
 
@@ -51,6 +59,7 @@ export interface ApiPlantResponse {
 export interface IdentifiedPlant {
   id: string; // Unique ID for the result in the history list
   image_urls: string[]; // R2 URLs or base64 fallback for legacy records
+  thumbnail_urls?: string[]; // Small renditions for list views, when available
   plantName: string; // The primary name from the top suggestion
   scientificName?: string; // A common name, if available
   confidence: number; // Probability percentage
@@ -2,22 +2,35 @@
 import os
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse
-from authlib.integrations.starlette_client import OAuth, OAuthError
 from dotenv import load_dotenv
 
+from .clients import LazyClient
+from .deps import issue_token
+
 load_dotenv()
 
 router = APIRouter(prefix="/api/auth")
 
-# 1) Configure the OAuth client
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=os.getenv('GOOGLE_CLIENT_ID'),
-    client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={'scope': 'openid email profile'}
-)
+# 1) Configure the OAuth client (authlib is imported on first use)
+def _oauth():
+    from authlib.integrations.starlette_client import OAuth
+
+    oauth = OAuth()
+    oauth.register(
+        name='google',
+        client_id=os.getenv('GOOGLE_CLIENT_ID'),
+        client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
+        server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+        client_kwargs={'scope': 'openid email profile'}
+    )
+    return oauth
+
+async def _load_google_metadata(oauth):
+    """Fetch Google's discovery document now rather than on the first login."""
+    if os.getenv('GOOGLE_CLIENT_ID'):
+        await oauth.google.load_server_metadata()
+
+oauth = LazyClient("oauth", _oauth, warm=_load_google_metadata)
 
 # 2) “Login” endpoint: redirect user to Google
 @router.get("/google/login")
@@ -28,6 +41,8 @@ async def login(request: Request):
 # 3) Callback: Google redirects back here!
 @router.get("/google/callback", name="auth_callback")
 async def auth_callback(request: Request):
+    from authlib.integrations.starlette_client import OAuthError
+
     try:
         token = await oauth.google.authorize_access_token(request)
     except OAuthError:
@@ -44,15 +59,14 @@ async def auth_callback(request: Request):
     # db.users.update_one({ "google_id": user_info["sub"] }, { "$set": {...} }, upsert=True)
     #
     # Then create your own signed token (JWT) to send back:
-    from fastapi import Response
-    import jwt, time
+    import time
 
     payload = {
         "sub": user_info["sub"],
         "email": user_info["email"],
         "exp": time.time() + 3600
     }
-    jwt_token = jwt.encode(payload, os.getenv("JWT_SECRET"), algorithm="HS256")
+    jwt_token = issue_token(payload)
 
     frontend_url = os.getenv("FRONTEND_URL", "http://localhost:8080/")
     is_secure = frontend_url.startswith("https://")
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Warm-up steps that take longer than this are abandoned; the client is then
+# built on first use instead
+WARM_TIMEOUT_SECONDS = 10.0
+
+_registry: List["LazyClient"] = []
+
+
+class LazyClient:
+    """Stand-in for an external client that is only built when first used.
+
+    Attribute and item access are forwarded to the real client, so module
+    level names such as ``routes.plant_client`` keep working (and can still
+    be monkeypatched) while importing the app stays cheap. ``warm_all`` builds
+    every registered client in parallel during startup.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        warm: Optional[Callable[[Any], Awaitable[None]]] = None,
+        register: bool = True,
+    ):
+        self._name = name
+        self._factory = factory
+        self._warm = warm
+        self._instance = None
+        self._lock = threading.Lock()
+        if register:
+            _registry.append(self)
+
+    def instance(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def override(self, value):
+        """Use ``value`` instead of building the client; ``None`` resets it."""
+        self._instance = value
+
+    @property
+    def built(self) -> bool:
+        return self._instance is not None
+
+    async def warm(self):
+        if not self.built:
+            await asyncio.to_thread(self.instance)
+        if self._warm is not None:
+            await self._warm(self._instance)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.instance(), name)
+
+    def __getitem__(self, key):
+        return self.instance()[key]
+
+    def __repr__(self):
+        return f"<LazyClient {self._name} built={self.built}>"
+
+
+async def _timed(name: str, step: Callable[[], Awaitable[None]], timings: Dict[str, float]):
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(step(), timeout=WARM_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning("warming %s failed, it will be built on first use: %s", name, e)
+    timings[name] = time.perf_counter() - start
+
+
+async def warm_all(extra: Optional[Dict[str, Callable[[], Awaitable[None]]]] = None) -> Dict[str, float]:
+    """Build all registered clients (plus ``extra`` steps) concurrently.
+
+    Failures are logged, not raised: a client that could not be warmed is
+    built lazily by the first request that needs it. Returns seconds per step.
+    """
+    timings: Dict[str, float] = {}
+    steps = {c._name: c.warm for c in _registry}
+    steps.update(extra or {})
+    await asyncio.gather(*(_timed(name, step, timings) for name, step in steps.items()))
+    return timings
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "10000"))
+COUNT_CACHE_TTL_SECONDS = float(os.getenv("COUNT_CACHE_TTL_SECONDS", "30"))
+# How long another worker's writes may go unnoticed by cached version stamps
+VERSION_CACHE_TTL_SECONDS = float(os.getenv("VERSION_CACHE_TTL_SECONDS", "5"))
+# How often the drift repair job runs; 0 disables it
+RECONCILE_INTERVAL_SECONDS = float(os.getenv("COUNT_RECONCILE_INTERVAL_SECONDS", "3600"))
+
+_cache = LRUCache(COUNT_CACHE_SIZE, COUNT_CACHE_TTL_SECONDS)
+_versions = LRUCache(COUNT_CACHE_SIZE, VERSION_CACHE_TTL_SECONDS)
+
+
+async def increment_plant_count(db, user_id: str, delta: int = 1) -> int:
+    """Atomically adjust a user's plant counter and return the new value.
+
+    Also bumps the user's collection version, see ``bump_version``.
+    """
+    doc = await db.user_stats.find_one_and_update(
+        {"_id": user_id, "plant_count": {"$exists": True}},
+        {"$inc": {"plant_count": delta, "version": 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        # No counter yet: the plants collection already includes this change
+        doc = await _seed(db, user_id)
+        doc["version"] = await bump_version(db, user_id)
+    count = doc["plant_count"]
+    _cache.set(user_id, (doc["version"], count))
+    _versions.set(user_id, doc["version"])
+    return count
+
+
+async def bump_version(db, user_id: str) -> int:
+    """Mark the user's collection as changed; returns the new version stamp."""
+    doc = await db.user_stats.find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    _versions.set(user_id, doc["version"])
+    return doc["version"]
+
+
+async def get_version(db, user_id: str) -> int:
+    """Return the user's collection version stamp, changed by every mutation."""
+    version = _versions.get(user_id)
+    if version is None:
+        doc = await db.user_stats.find_one({"_id": user_id}, {"version": 1})
+        version = (doc or {}).get("version", 0)
+        _versions.set(user_id, version)
+    return version
+
+
+async def get_plant_count(db, user_id: str) -> int:
+    """Return a user's plant count without scanning their plants.
+
+    The counter is created from a one-off ``count_documents`` the first time
+    a user is seen. Cached counts are tied to the collection version, so a
+    write seen through the version stamp is never answered with an old count.
+    """
+    version = await get_version(db, user_id)
+    cached = _cache.get(user_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    doc = await db.user_stats.find_one({"_id": user_id})
+    if doc is None or "plant_count" not in doc:
+        doc = await _seed(db, user_id)
+    count = doc["plant_count"]
+    _cache.set(user_id, (doc.get("version", 0), count))
+    return count
+
+
+async def _seed(db, user_id: str) -> dict:
+    """Create a missing counter from the plants collection; return the stats document."""
+    initial = await db.plants.count_documents({"user_id": user_id})
+    try:
+        doc = await db.user_stats.find_one_and_update(
+            # Documents created by bump_version carry a version but no count
+            {"_id": user_id, "plant_count": {"$exists": False}},
+            {"$set": {"plant_count": initial}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        doc = None  # another request seeded it first
+    return doc or await db.user_stats.find_one({"_id": user_id})
+
+
+async def reconcile(db) -> int:
+    """Rewrite every user's counter from the plants collection; return users fixed.
+
+    Each repair only applies if the user's version is still the one read
+    before counting. Otherwise a write that lands while the aggregation runs
+    would be overwritten with the stale count.
+    """
+    versions = {
+        doc["_id"]: doc.get("version")
+        async for doc in db.user_stats.find({}, {"version": 1})
+    }
+    fixed = 0
+    counted = set()
+    pipeline = [{"$group": {"_id": "$user_id", "n": {"$sum": 1}}}]
+    async for row in db.plants.aggregate(pipeline):
+        counted.add(row["_id"])
+        if row["_id"] not in versions:
+            continue  # seeded from count_documents on first use
+        result = await db.user_stats.update_one(
+            {"_id": row["_id"], "version": versions[row["_id"]], "plant_count": {"$ne": row["n"]}},
+            {"$set": {"plant_count": row["n"]}, "$inc": {"version": 1}},
+        )
+        if result.matched_count:
+            fixed += 1
+            _cache.pop(row["_id"])
+            _versions.pop(row["_id"])
+    # Users whose plants are all gone but whose counter is not zero
+    stale = db.user_stats.find({"plant_count": {"$ne": 0}}, {"_id": 1})
+    async for doc in stale:
+        if doc["_id"] not in counted and doc["_id"] in versions:
+            result = await db.user_stats.update_one(
+                {"_id": doc["_id"], "version": versions[doc["_id"]]},
+                {"$set": {"plant_count": 0}, "$inc": {"version": 1}},
+            )
+            if result.matched_count:
+                _cache.pop(doc["_id"])
+                _versions.pop(doc["_id"])
+                fixed += 1
+    return fixed
+
+
+async def reconcile_forever(db, interval: Optional[float] = None):
+    """Background task that periodically repairs counter drift."""
+    interval = RECONCILE_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            fixed = await reconcile(db)
+            if fixed:
+                logger.info("reconciled %d plant counters", fixed)
+        except Exception:
+            logger.exception("plant counter reconciliation failed")
+
+
+def clear_cache():
+    _cache.clear()
+    _versions.clear()
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Set
+
+from . import image_refs
+from .storage import delete_images, get_backend
+
+logger = logging.getLogger(__name__)
+
+# Outbox entries claimed per drain pass; each holds the URLs of one request
+BATCH_ENTRIES = int(os.getenv("DELETION_BATCH_ENTRIES", "200"))
+POLL_INTERVAL_SECONDS = float(os.getenv("DELETION_POLL_INTERVAL_SECONDS", "30"))
+# A claimed entry is retried by any worker once its lease runs out
+LEASE_SECONDS = 300
+MAX_BACKOFF_SECONDS = 3600
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _keys(urls: List[str]) -> List[str]:
+    backend = get_backend()
+    return [k for k in (backend.key_from_url(u) for u in urls) if k is not None]
+
+
+async def enqueue(db, urls: List[str]):
+    """Drop the references held by ``urls``; the worker removes unreferenced objects later."""
+    if not urls:
+        return
+    await image_refs.release(db, _keys(urls))
+    now = _now()
+    await db.deletion_outbox.insert_one({
+        "urls": list(urls),
+        "attempts": 0,
+        "created_at": now,
+        "next_attempt_at": now,
+    })
+    wake()
+
+
+async def drain(db) -> int:
+    """Delete the objects of all due outbox entries; return entries completed.
+
+    Objects still referenced by another plant are skipped. Storage deletes
+    are idempotent, so an entry processed twice by competing workers is
+    harmless.
+    """
+    now = _now()
+    entries = await db.deletion_outbox.find(
+        {"next_attempt_at": {"$lte": now}}
+    ).sort("next_attempt_at", 1).limit(BATCH_ENTRIES).to_list(length=BATCH_ENTRIES)
+    if not entries:
+        return 0
+    ids = [e["_id"] for e in entries]
+    await db.deletion_outbox.update_many(
+        {"_id": {"$in": ids}},
+        {"$set": {"next_attempt_at": now + timedelta(seconds=LEASE_SECONDS)}},
+    )
+    urls = [url for e in entries for url in e["urls"]]
+    claimed = await image_refs.claim(db, _keys(urls))
+    try:
+        # One batched DeleteObjects round trip per 1000 keys across all entries
+        backend, unreferenced = get_backend(), set(claimed)
+        await delete_images([u for u in urls if backend.key_from_url(u) in unreferenced])
+    except Exception as e:
+        logger.warning("deleting %d outbox entries failed: %s", len(entries), e)
+        for entry in entries:
+            attempts = entry.get("attempts", 0) + 1
+            backoff = min(2 ** attempts * 5, MAX_BACKOFF_SECONDS)
+            await db.deletion_outbox.update_one(
+                {"_id": entry["_id"]},
+                {"$set": {
+                    "attempts": attempts,
+                    "last_error": str(e),
+                    "next_attempt_at": now + timedelta(seconds=backoff),
+                }},
+            )
+        return 0
+    finally:
+        await image_refs.finish(db, claimed)
+    await db.deletion_outbox.delete_many({"_id": {"$in": ids}})
+    return len(entries)
+
+
+# Wake-up events of the workers running in this process
+_wake_events: Set[asyncio.Event] = set()
+
+
+def wake():
+    """Tell running workers new entries are waiting instead of letting them poll."""
+    for event in _wake_events:
+        event.set()
+
+
+async def run_worker(db, poll_interval: float = POLL_INTERVAL_SECONDS):
+    """Drain the deletion outbox until cancelled."""
+    event = asyncio.Event()
+    _wake_events.add(event)
+    try:
+        while True:
+            try:
+                if await drain(db):
+                    continue
+            except Exception:
+                logger.exception("deletion outbox drain failed")
+            try:
+                await asyncio.wait_for(event.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+    finally:
+        _wake_events.discard(event)
@@ -1,22 +1,95 @@
 # server/app/deps.py
-from fastapi import Depends, HTTPException, Request
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import jwt, os
+from fastapi import HTTPException, Request
+import hashlib
+import jwt, os, time
+from typing import Dict, Optional, Tuple
+
+from .cache import LRUCache
+
+ALGORITHM = "HS256"
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+# Used for tokens without an ``exp`` claim
+TOKEN_CACHE_DEFAULT_TTL = 300
+
+# kid -> secret; the first entry signs new tokens, the rest still verify
+_keys: Dict[str, str] = {}
+_token_cache = LRUCache(TOKEN_CACHE_SIZE)
+
+
+def _kid(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()[:8]
+
+
+def load_keys():
+    """(Re)load signing keys from the environment and forget verified tokens.
+
+    ``JWT_SECRET`` signs new tokens. Comma separated ``JWT_PREVIOUS_SECRETS``
+    keep tokens signed before a rotation valid until they expire.
+    """
+    secrets = [os.getenv("JWT_SECRET")] + os.getenv("JWT_PREVIOUS_SECRETS", "").split(",")
+    _keys.clear()
+    for secret in secrets:
+        if secret and secret.strip():
+            _keys.setdefault(_kid(secret.strip()), secret.strip())
+    _token_cache.clear()
+
+
+def signing_key() -> Tuple[str, str]:
+    """Return ``(kid, secret)`` used to sign new tokens."""
+    if not _keys:
+        load_keys()
+    if not _keys:
+        raise RuntimeError("JWT_SECRET not set in environment variables")
+    return next(iter(_keys.items()))
+
+
+def issue_token(payload: dict) -> str:
+    kid, secret = signing_key()
+    return jwt.encode(payload, secret, algorithm=ALGORITHM, headers={"kid": kid})
+
+
+def verify_token(token: str) -> dict:
+    """Return the payload of a valid token, serving repeat tokens from memory."""
+    payload = _token_cache.get(token)
+    if payload is not None:
+        return payload
+    if not _keys:
+        load_keys()
+    kid = jwt.get_unverified_header(token).get("kid")
+    candidates = [_keys[kid]] if kid in _keys else list(_keys.values())
+    if not candidates:
+        raise jwt.InvalidKeyError("No JWT secret configured")
+    error: Optional[jwt.PyJWTError] = None
+    for secret in candidates:
+        try:
+            payload = jwt.decode(token, secret, algorithms=[ALGORITHM])
+            break
+        except jwt.InvalidSignatureError as e:
+            error = e
+    else:
+        raise error
+    exp = payload.get("exp")
+    ttl = exp - time.time() if isinstance(exp, (int, float)) else TOKEN_CACHE_DEFAULT_TTL
+    if ttl > 0:
+        _token_cache.set(token, payload, ttl=ttl)
+    return payload
+
+
+def _bearer_token(request: Request) -> Optional[str]:
+    authorization = request.headers.get("authorization")
+    if authorization:
+        scheme, _, credentials = authorization.partition(" ")
+        if scheme.lower() == "bearer" and credentials:
+            return credentials
+    return None
 
-oauth2_scheme = HTTPBearer(auto_error=False)
 
 async def get_current_user(request: Request):
     """Return JWT payload from header or cookie."""
-    credentials: HTTPAuthorizationCredentials | None = await oauth2_scheme(request)
-    token = None
-    if credentials:
-        token = credentials.credentials
-    else:
-        token = request.cookies.get("access_token")
+    token = _bearer_token(request) or request.cookies.get("access_token")
     if not token:
         raise HTTPException(401, "Invalid auth token")
     try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET"), algorithms=["HS256"])
+        return verify_token(token)  # e.g. { sub, email, exp }
     except jwt.PyJWTError:
         raise HTTPException(401, "Invalid auth token")
-    return payload  # e.g. { sub, email, exp }
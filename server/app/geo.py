@@ -0,0 +1,40 @@
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+
+
+def point(latitude: Optional[float], longitude: Optional[float]) -> Optional[Dict[str, Any]]:
+    """GeoJSON point for a plant's ``location`` field, or ``None`` if unknown."""
+    if latitude is None or longitude is None:
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def bbox_filter(bbox: str) -> Dict[str, Any]:
+    """Turn ``min_lng,min_lat,max_lng,max_lat`` into a filter on ``latitude``/``longitude``.
+
+    Plain coordinate ranges keep the box a true lat/lng rectangle of any
+    width; a GeoJSON polygon would have great-circle edges and be read the
+    short way round once it spans more than 180 degrees. ``min_lng > max_lng``
+    is a box crossing the antimeridian and is split in two.
+    """
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lng,min_lat,max_lng,max_lat")
+    if not (
+        -180 <= min_lng <= 180 and -180 <= max_lng <= 180 and min_lng != max_lng
+        and -90 <= min_lat < max_lat <= 90
+    ):
+        raise HTTPException(status_code=400, detail="Invalid bbox")
+    query: Dict[str, Any] = {"latitude": {"$gte": min_lat, "$lte": max_lat}}
+    if min_lng < max_lng:
+        query["longitude"] = {"$gte": min_lng, "$lte": max_lng}
+    else:
+        query["$or"] = [
+            {"longitude": {"$gte": min_lng, "$lte": 180}},
+            {"longitude": {"$gte": -180, "$lte": max_lng}},
+        ]
+    return query
@@ -0,0 +1,58 @@
+import hashlib
+import os
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request, Response
+
+from . import counters
+from .cache import LRUCache
+from .serialization import dumps
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+# Bodies larger than this are served with an ETag but not kept in memory
+RESPONSE_CACHE_MAX_BODY = int(os.getenv("RESPONSE_CACHE_MAX_BODY", str(256 * 1024)))
+# Browsers must revalidate, which is cheap: a 304 needs no query or encoding
+CACHE_CONTROL = "private, no-cache"
+
+_responses = LRUCache(RESPONSE_CACHE_SIZE)
+
+
+def _etag(user_id: str, version: int, request: Request) -> str:
+    raw = f"{user_id}:{version}:{request.url.path}?{request.url.query}"
+    return 'W/"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+
+async def conditional_json(
+    request: Request, db, user_id: str, build: Callable[[], Awaitable[Any]]
+) -> Response:
+    """Serve a per-user JSON read with ETag revalidation and an in-process cache.
+
+    The ETag is derived from the user's collection version stamp, so it is
+    the same on every worker and changes whenever the collection does.
+    """
+    version = await counters.get_version(db, user_id)
+    etag = _etag(user_id, version, request)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    key = (user_id, request.url.path, request.url.query)
+    cached = _responses.get(key)
+    if cached is not None and cached[0] == etag:
+        body = cached[1]
+    else:
+        data = await build()
+        if isinstance(data, Response):
+            return data
+        body = dumps(data)
+        if len(body) <= RESPONSE_CACHE_MAX_BODY:
+            _responses.set(key, (etag, body))
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def clear_cache():
+    _responses.clear()
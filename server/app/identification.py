@@ -0,0 +1,134 @@
+import asyncio
+import functools
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from . import metrics
+
+# Maximum number of Plant.id calls allowed to run at the same time
+MAX_IN_FLIGHT = int(os.getenv("IDENTIFY_MAX_IN_FLIGHT", "4"))
+# How long finished background jobs are kept around for polling
+JOB_TTL_SECONDS = float(os.getenv("IDENTIFY_JOB_TTL_SECONDS", "900"))
+
+
+class IdentificationEngine:
+    """Run blocking identification calls off the event loop with bounded concurrency.
+
+    The kindwise client is synchronous, so every call is handed to a dedicated
+    worker pool. A semaphore caps how many calls are in flight; extra callers
+    wait in line without tying up a thread. Whole identify pipelines can also be
+    submitted as background jobs and polled by id.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, job_ttl: float = JOB_TTL_SECONDS):
+        self.max_in_flight = max(1, max_in_flight)
+        self.job_ttl = job_ttl
+        self.in_flight = 0
+        self.queued = 0
+        # Moving average of call duration, used to estimate queue wait times
+        self.avg_call_seconds = 2.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self):
+        """Create the worker pool and in-flight limiter if not running yet."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_in_flight, thread_name_prefix="identify"
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    async def shutdown(self):
+        """Cancel outstanding jobs and release the worker pool."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        self._jobs.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._semaphore = None
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call ``fn`` in the worker pool once an in-flight slot is free."""
+        self.start()
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        start = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(fn, *args, **kwargs)
+            )
+        finally:
+            self.avg_call_seconds = 0.8 * self.avg_call_seconds + 0.2 * (time.monotonic() - start)
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    # --- Background jobs ---
+    def submit(self, owner: str, work: Awaitable[Any]) -> str:
+        """Schedule ``work`` as a background job and return its id."""
+        self._prune()
+        job_id = uuid.uuid4().hex
+        self._jobs[job_id] = {
+            "job_id": job_id,
+            "owner": owner,
+            "status": "pending",
+            "result": None,
+            "status_code": None,
+            "detail": None,
+            "finished_at": None,
+        }
+        self._tasks[job_id] = asyncio.create_task(self._run_job(job_id, work))
+        return job_id
+
+    async def _run_job(self, job_id: str, work: Awaitable[Any]):
+        job = self._jobs[job_id]
+        try:
+            job["result"] = await work
+            job["status"] = "completed"
+        except asyncio.CancelledError:
+            job["status"] = "failed"
+            job["detail"] = "Cancelled"
+            raise
+        except Exception as e:
+            job["status"] = "failed"
+            job["status_code"] = getattr(e, "status_code", 500)
+            job["detail"] = getattr(e, "detail", None) or str(e)
+        finally:
+            job["finished_at"] = time.monotonic()
+            self._tasks.pop(job_id, None)
+
+    def get_job(self, job_id: str, owner: str) -> Optional[Dict[str, Any]]:
+        """Return the public view of a job, or ``None`` if unknown to ``owner``."""
+        self._prune()
+        job = self._jobs.get(job_id)
+        if job is None or job["owner"] != owner:
+            return None
+        return {k: v for k, v in job.items() if k not in ("owner", "finished_at")}
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+engine = IdentificationEngine()
+
+metrics.GaugeFunction("identify_in_flight", "Plant.id calls running.", lambda: engine.in_flight)
+metrics.GaugeFunction("identify_queued", "Plant.id calls waiting for a worker.", lambda: engine.queued)
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv("IDENTIFY_CACHE_SIZE", "256"))
+CACHE_TTL_SECONDS = float(os.getenv("IDENTIFY_CACHE_TTL_SECONDS", "86400"))
+
+
+def cache_key(
+    image_digests: Iterable[str],
+    latitude: Optional[float],
+    longitude: Optional[float],
+    details: Iterable[str],
+) -> str:
+    """Hash everything that influences a Plant.id answer into a cache key.
+
+    Images are represented by the SHA-256 digests computed while spooling them.
+    """
+    h = hashlib.sha256()
+    for digest in image_digests:
+        h.update(digest.encode())
+    h.update(repr((latitude, longitude)).encode())
+    h.update(",".join(sorted(details)).encode())
+    return h.hexdigest()
+
+
+class IdentificationCache:
+    """Two-tier cache of Plant.id results with request coalescing.
+
+    Results live in an in-memory LRU backed by the ``identification_cache``
+    Mongo collection, whose ``expires_at`` TTL index evicts stale entries.
+    Concurrent lookups of the same key share one upstream call.
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._memory = LRUCache(maxsize, ttl)
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def get_or_compute(self, db, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        cached = self._memory.get(key)
+        if cached is not None:
+            return cached
+        pending = self._pending.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this caller was cancelled, not the shared call
+                # The leading request went away; start over, possibly as the new leader
+                return await self.get_or_compute(db, key, compute)
+
+        future = asyncio.get_running_loop().create_future()
+        # Failures are re-raised to the caller; don't warn when nobody else waited
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending[key] = future
+        try:
+            value = await self._load(db, key)
+            if value is None:
+                value = await compute()
+                await self._store(db, key, value)
+            self._memory.set(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    async def _load(self, db, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            doc = await db.identification_cache.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+            )
+        except Exception:
+            logger.warning("identification cache lookup failed", exc_info=True)
+            return None
+        return doc["result"] if doc else None
+
+    async def _store(self, db, key: str, value: Dict[str, Any]):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        try:
+            await db.identification_cache.update_one(
+                {"_id": key},
+                {"$set": {"result": value, "expires_at": expires_at}},
+                upsert=True,
+            )
+        except Exception:
+            logger.warning("identification cache write failed", exc_info=True)
+
+    def clear(self):
+        self._memory.clear()
+
+
+identification_cache = IdentificationCache()
@@ -0,0 +1,108 @@
+"""Reference counts for content-addressed storage objects.
+
+Images are stored under the SHA-256 of their bytes, so the same photo (or
+rendition) uploaded twice is one object. ``db.image_refs`` counts the plant
+documents using each key and the deletion worker only removes objects
+nobody references any more.
+
+A document is ``{_id: key, count, stored, deleting_until}``: ``stored`` is
+set once the object is known to exist, ``deleting_until`` is the lease of a
+worker deleting it. An upload of the same bytes waits for that lease to be
+released before writing the object again, so it can never be deleted from
+under a new reference.
+"""
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# A deleting worker that dies holding a key gives it up after this long
+DELETE_LEASE_SECONDS = 60
+_POLL_SECONDS = 0.05
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def _wait_for_delete(db, key: str):
+    deadline = asyncio.get_running_loop().time() + DELETE_LEASE_SECONDS
+    while asyncio.get_running_loop().time() < deadline:
+        if await db.image_refs.find_one({"_id": key, "deleting_until": {"$gt": _now()}}) is None:
+            return
+        await asyncio.sleep(_POLL_SECONDS)
+
+
+async def acquire(db, key: str) -> bool:
+    """Add a reference to ``key``; return True if the object is known to be stored.
+
+    Waits for a concurrent deletion of the same object to finish first, the
+    caller then has to upload it again.
+    """
+    before = await db.image_refs.find_one_and_update(
+        {"_id": key},
+        {"$inc": {"count": 1}, "$setOnInsert": {"stored": False, "deleting_until": None}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is None:
+        return False
+    if before.get("deleting_until"):
+        await _wait_for_delete(db, key)
+        return False
+    return bool(before.get("stored"))
+
+
+async def mark_stored(db, key: str):
+    await db.image_refs.update_one({"_id": key}, {"$set": {"stored": True}})
+
+
+async def release(db, keys: Iterable[str]):
+    """Drop one reference per occurrence of each key."""
+    await asyncio.gather(*[
+        db.image_refs.update_one({"_id": key}, {"$inc": {"count": -n}})
+        for key, n in Counter(keys).items()
+    ])
+
+
+async def abandon(db, key: str):
+    """Drop the reference of an upload that failed; forget the key if it was the only one."""
+    await release(db, [key])
+    await db.image_refs.delete_many(
+        {"_id": key, "count": {"$lte": 0}, "stored": False, "deleting_until": None}
+    )
+
+
+async def _claim(db, key: str, now: datetime) -> bool:
+    lease = now + timedelta(seconds=DELETE_LEASE_SECONDS)
+    claimed = await db.image_refs.find_one_and_update(
+        {"_id": key, "count": {"$lte": 0}, "deleting_until": {"$not": {"$gt": now}}},
+        {"$set": {"stored": False, "deleting_until": lease}},
+    )
+    if claimed is not None:
+        return True
+    try:
+        # Objects stored before reference counting have no document yet
+        await db.image_refs.insert_one({"_id": key, "count": 0, "stored": False, "deleting_until": lease})
+    except DuplicateKeyError:
+        return False  # still referenced, or another worker is deleting it
+    return True
+
+
+async def claim(db, keys: Iterable[str]) -> List[str]:
+    """Lease the unreferenced ``keys`` for deletion; return those claimed."""
+    keys = list(dict.fromkeys(keys))
+    now = _now()
+    claimed = await asyncio.gather(*[_claim(db, key, now) for key in keys])
+    return [key for key, ok in zip(keys, claimed) if ok]
+
+
+async def finish(db, keys: List[str]):
+    """Release deletion leases; forget keys that are still unreferenced."""
+    if not keys:
+        return
+    await db.image_refs.delete_many({"_id": {"$in": keys}, "count": {"$lte": 0}})
+    await db.image_refs.update_many({"_id": {"$in": keys}}, {"$set": {"deleting_until": None}})
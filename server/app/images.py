@@ -0,0 +1,80 @@
+import asyncio
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Union
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+
+from .uploads import SpooledImage
+
+# Longest edge of each stored rendition; "medium" is also what Plant.id gets
+RENDITION_SIZES = {
+    "medium": int(os.getenv("IMAGE_MEDIUM_SIZE", "1500")),
+    "thumbnail": int(os.getenv("IMAGE_THUMBNAIL_SIZE", "320")),
+}
+# 0 renders in a thread instead of a separate process
+PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+# Larger originals are decoded in a thread straight from their spooled file
+# instead of being read into memory and copied into a worker process
+PROCESS_MAX_BYTES = int(os.getenv("IMAGE_PROCESS_MAX_BYTES", str(2 * 1024 * 1024)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _render(data: Union[bytes, BinaryIO], sizes: Dict[str, int], quality: int) -> Dict[str, bytes]:
+    """Decode an image once and encode a JPEG per rendition, largest first."""
+    with Image.open(io.BytesIO(data) if isinstance(data, bytes) else data) as img:
+        # Let the JPEG decoder downscale while decoding when it can
+        largest = max(sizes.values())
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+
+        out = {}
+        for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+            img.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=quality, optimize=True)
+            out[name] = buf.getvalue()
+        return out
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if _pool is None and PROCESS_WORKERS > 0:
+        _pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def render(image: SpooledImage) -> Dict[str, bytes]:
+    """Produce the JPEG renditions of one uploaded image off the event loop."""
+    def read():
+        image.seek(0)
+        return image.read()
+
+    pool = get_pool()
+    try:
+        if pool is None or image.size > PROCESS_MAX_BYTES:
+            image.seek(0)
+            return await asyncio.to_thread(_render, image.file, RENDITION_SIZES, JPEG_QUALITY)
+        data = await asyncio.to_thread(read)
+        return await asyncio.get_running_loop().run_in_executor(
+            pool, _render, data, RENDITION_SIZES, JPEG_QUALITY
+        )
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="Unsupported image format")
+
+
+async def render_all(images: List[SpooledImage]) -> List[Dict[str, bytes]]:
+    return list(await asyncio.gather(*[render(img) for img in images]))
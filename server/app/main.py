@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -5,71 +6,132 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse
 from fastapi import Request, HTTPException
+import logging
 import os
 
 from .routes import router
 from .auth import router as auth_router
 from .mongodb_server import db  # <-- your Motor client
+from .identification import engine as identification_engine
+from . import clients, counters, deletion, deps, images, search, storage
+from .clients import LazyClient
+from .metrics import MetricsMiddleware
+from .static import SPAStaticFiles, ApiGZipMiddleware, PRECOMPRESS, precompress
+from .uploads import UploadLimitMiddleware, MAX_IMPORT_BYTES, IMPORT_PATHS
+
+logger = logging.getLogger(__name__)
+
+frontend_dir = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../plant-tracker-client/dist")
+)
+
+async def _connect_mongo():
+    if isinstance(db, LazyClient):
+        # Building the Motor client can resolve DNS (mongodb+srv); keep it off the loop
+        await asyncio.to_thread(db.instance)
+    # Warm up the driver / open pool & auth
+    await db.client.admin.command("ping")
+    await asyncio.gather(
+        # Compound index serving per-user lookups and newest-first keyset paging
+        db.plants.create_index([("user_id", 1), ("_id", -1)], name="idx_user_id_id"),
+        # Geospatial index for nearby / bounding box queries
+        db.plants.create_index([("user_id", 1), ("location", "2dsphere")], name="idx_user_id_location"),
+        # Bounding box queries are plain latitude/longitude ranges
+        db.plants.create_index([("user_id", 1), ("latitude", 1), ("longitude", 1)], name="idx_user_id_lat_lng"),
+        # Per-user text search (ranked) and prefix type-ahead
+        db.plants.create_index(
+            [("user_id", 1), ("search_names", "text"), ("notes", "text")],
+            name="idx_user_id_text",
+            weights=search.TEXT_WEIGHTS,
+        ),
+        db.plants.create_index([("user_id", 1), ("search_keys", 1)], name="idx_user_id_search_keys"),
+        # Expire cached Plant.id results automatically
+        db.identification_cache.create_index("expires_at", name="idx_expires_at", expireAfterSeconds=0),
+        db.deletion_outbox.create_index("next_attempt_at", name="idx_next_attempt_at"),
+        # Idle rate limit buckets are full again long before this
+        db.rate_limits.create_index("updated_at", name="idx_updated_at", expireAfterSeconds=86400),
+    )
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- Startup code ---
-    # 1) Warm up the driver / open pool & auth
-    await db.client.admin.command("ping")
-    # 2) Create index on user_id for fast lookups
-    await db.plants.create_index("user_id", name="idx_user_id")
+    # 0) Load JWT keys once instead of on every request
+    deps.load_keys()
+    # 1) Connect to Mongo and build Plant.id, OAuth and storage clients in parallel
+    _, timings = await asyncio.gather(
+        _connect_mongo(), clients.warm_all({"storage": storage.warm})
+    )
+    logger.info("clients warmed: %s", ", ".join(f"{k}={v * 1000:.0f}ms" for k, v in timings.items()))
+    # 2) Spin up the identification worker pool
+    identification_engine.start()
+    # 3) Periodically repair drift in the per-user plant counters
+    reconcile_task = asyncio.create_task(counters.reconcile_forever(db))
+    # 4) Drain the storage deletion outbox in the background
+    deletion_task = asyncio.create_task(deletion.run_worker(db))
+    # 5) Build missing .gz/.br variants of the client bundle
+    if PRECOMPRESS and os.path.isdir(frontend_dir):
+        await asyncio.to_thread(precompress, frontend_dir)
     yield
-    # --- (optional) Shutdown code could go here ---
+    # --- Shutdown code ---
+    reconcile_task.cancel()
+    deletion_task.cancel()
+    await identification_engine.shutdown()
+    storage.shutdown()
+    images.shutdown()
 
-app = FastAPI(lifespan=lifespan)
+def create_app() -> FastAPI:
+    """Build the ASGI app. External clients are created lazily and warmed in ``lifespan``.
 
-# Trust Railway's proxy so request.url_for() generates https:// URLs
-app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
+    ``uvicorn app.main:app`` uses the module level instance below;
+    ``uvicorn --factory app.main:create_app`` builds a fresh one.
+    """
+    app = FastAPI(lifespan=lifespan)
 
-# === Middlewares ===
-app.add_middleware(
-    SessionMiddleware,
-    secret_key=os.getenv("SESSION_SECRET_KEY", "a-strong-fallback-secret"),
-    session_cookie="session",
-    max_age=86400,
-)
+    # Trust Railway's proxy so request.url_for() generates https:// URLs
+    app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
 
-origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:8080")
-origins_array = [o.strip() for o in origins.split(",")]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins_array,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    # === Middlewares ===
+    app.add_middleware(UploadLimitMiddleware)
+    app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_IMPORT_BYTES, paths=IMPORT_PATHS)
+    app.add_middleware(
+        SessionMiddleware,
+        secret_key=os.getenv("SESSION_SECRET_KEY", "a-strong-fallback-secret"),
+        session_cookie="session",
+        max_age=86400,
+    )
 
-# === Routers ===
-app.include_router(auth_router)
-app.include_router(router)
+    origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:8080")
+    origins_array = [o.strip() for o in origins.split(",")]
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins_array,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
-# === Static Files ===
-frontend_dir = os.path.abspath(
-    os.path.join(os.path.dirname(__file__), "../../plant-tracker-client/dist")
-)
-if os.path.isdir(frontend_dir):
-    class SPAStaticFiles(StaticFiles):
-        async def get_response(self, path, scope):
-            response = await super().get_response(path, scope)
-            if response.status_code == 404:
-                # Return index.html for any non-file path so that client-side
-                # routing works when the page is refreshed or directly visited.
-                return FileResponse(os.path.join(self.directory, "index.html"))
-            return response
-
-    app.mount("/", SPAStaticFiles(directory=frontend_dir, html=True), name="frontend")
-
-    @app.exception_handler(404)
-    async def spa_fallback(request: Request, exc: HTTPException):
-        """Serve index.html for unknown non-API routes."""
-        if not request.url.path.startswith("/api"):
-            return FileResponse(os.path.join(frontend_dir, "index.html"))
-        return JSONResponse({"detail": "Not Found"}, status_code=404)
+    app.add_middleware(ApiGZipMiddleware)
+    # Outermost, so timings include every other middleware
+    app.add_middleware(MetricsMiddleware)
+
+    # === Routers ===
+    app.include_router(auth_router)
+    app.include_router(router)
+
+    # === Static Files ===
+    if os.path.isdir(frontend_dir):
+        spa = SPAStaticFiles(directory=frontend_dir, html=True)
+        app.mount("/", spa, name="frontend")
+
+        @app.exception_handler(404)
+        async def spa_fallback(request: Request, exc: HTTPException):
+            """Serve index.html for unknown non-API routes."""
+            if not request.url.path.startswith("/api"):
+                return spa.index.response(request.headers)
+            return JSONResponse({"detail": "Not Found"}, status_code=404)
+
+    return app
+
+app = create_app()
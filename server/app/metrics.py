@@ -0,0 +1,234 @@
+"""Low-overhead request/stage timing and a Prometheus text exposition.
+
+Every metric is a handful of dict updates under a lock, so it is cheap
+enough to leave on. Stage timings are also collected per request (through a
+context variable) and returned to the client as a ``Server-Timing`` header.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        # Mongo and boto hooks increment from driver threads while this runs
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for labels, value in snapshot:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+                self._sums[labels] = 0.0
+            counts[index] += 1
+            self._sums[labels] += value
+
+    def count(self, *labels: str) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            snapshot = [(k, list(v), self._sums[k]) for k, v in sorted(self._counts.items())]
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total:g}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class GaugeFunction(_Metric):
+    """A gauge read from a callback when metrics are scraped."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        super().__init__(name, help)
+        self._read = read
+
+    def render(self) -> List[str]:
+        return self._header() + [f"{self.name} {self._read():g}"]
+
+
+_registry: List[_Metric] = []
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")
+)
+requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests being served.", ("method",))
+stage_duration = Histogram("stage_duration_seconds", "Time spent in a named request stage.", ("stage",))
+mongo_commands = Counter("mongo_commands_total", "MongoDB commands sent.", ("command", "outcome"))
+mongo_duration = Histogram("mongo_command_duration_seconds", "MongoDB command latency.", ("command",))
+storage_calls = Counter("storage_calls_total", "Object storage (R2) API calls.", ("operation", "outcome"))
+
+# Stage timings of the current request: [(stage, seconds), ...]
+_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "stage_timings", default=None
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as ``name`` in the stage histogram and Server-Timing header."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, name)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    merged: Dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    merged["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in merged.items())
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Time every HTTP request per route and add a ``Server-Timing`` header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings: List[Tuple[str, float]] = []
+        token = _timings.set(timings)
+        status = 500
+        requests_in_flight.inc(scope["method"])
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(timings, time.perf_counter() - start)
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            requests_in_flight.dec(scope["method"])
+            # The route template (not the raw path) keeps label cardinality bounded
+            route = scope.get("route")
+            route_label = getattr(route, "path", None) or "unmatched"
+            request_duration.observe(time.perf_counter() - start, scope["method"], route_label, str(status))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Counts and times every command the driver sends."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_commands.inc(event.command_name, "ok")
+        mongo_duration.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        mongo_commands.inc(event.command_name, "error")
+        mongo_duration.observe(event.duration_micros / 1e6, event.command_name)
+
+
+def instrument_boto_client(client):
+    """Count each S3 API call a boto3 client makes, multipart parts included."""
+
+    def after_call(http_response=None, model=None, **kwargs):
+        status = getattr(http_response, "status_code", 0)
+        storage_calls.inc(getattr(model, "name", "unknown"), "ok" if status < 400 else "error")
+
+    client.meta.events.register("after-call.s3", after_call)
+    return client
@@ -0,0 +1,87 @@
+"""One-off data migrations.
+
+Run from the ``server`` directory, e.g.::
+
+    python -m app.migrations backfill_locations
+"""
+import asyncio
+import sys
+
+from pymongo import UpdateOne
+
+from . import geo, search, species
+
+BATCH_SIZE = 1000
+
+
+async def backfill_locations(db, batch_size: int = BATCH_SIZE) -> int:
+    """Add a GeoJSON ``location`` to plants that only have latitude/longitude."""
+    cursor = db.plants.find(
+        {
+            "location": {"$exists": False},
+            "latitude": {"$type": "number"},
+            "longitude": {"$type": "number"},
+        },
+        {"latitude": 1, "longitude": 1},
+    )
+    updated = 0
+    ops = []
+    async for doc in cursor:
+        location = geo.point(doc["latitude"], doc["longitude"])
+        if location is None:
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"location": location}}))
+        if len(ops) >= batch_size:
+            await db.plants.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await db.plants.bulk_write(ops, ordered=False)
+        updated += len(ops)
+    return updated
+
+
+async def backfill_search(db, batch_size: int = BATCH_SIZE) -> int:
+    """Add ``search_names``/``search_keys`` to plants saved before search existed."""
+    cursor = db.plants.find({"search_keys": {"$exists": False}}, {"suggestions": 1})
+    updated = 0
+    batch = []
+
+    async def flush():
+        await species.hydrate(db, batch)
+        ops = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": search.search_fields(doc.get("suggestions"))})
+            for doc in batch
+        ]
+        await db.plants.bulk_write(ops, ordered=False)
+        batch.clear()
+        return len(ops)
+
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            updated += await flush()
+    if batch:
+        updated += await flush()
+    return updated
+
+
+MIGRATIONS = {
+    "backfill_locations": backfill_locations,
+    "backfill_search": backfill_search,
+}
+
+
+def main(argv):
+    if len(argv) != 1 or argv[0] not in MIGRATIONS:
+        print(f"usage: python -m app.migrations {{{','.join(MIGRATIONS)}}}")
+        return 2
+    from .mongodb_server import db
+
+    count = asyncio.run(MIGRATIONS[argv[0]](db))
+    print(f"{argv[0]}: updated {count} documents")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
 from typing import List, Optional, Dict, Any
 
 # --- Pydantic Models ---
@@ -30,6 +30,11 @@ class Suggestion(BaseModel):
     best_watering: Optional[str] = None
     similar_images: Optional[List[SimilarImage]] = []
 
+class ImageRenditions(BaseModel):
+    original: str
+    medium: Optional[str] = None
+    thumbnail: Optional[str] = None
+
 class PlantResponse(BaseModel):
     id: Optional[str] = None
     user_id: Optional[str] = None
@@ -42,8 +47,44 @@ class PlantResponse(BaseModel):
     latitude: Optional[float] = None
     longitude: Optional[float] = None
     image_urls: Optional[List[str]] = None
+    renditions: Optional[List[ImageRenditions]] = None
     image_data: Optional[List[str]] = None
 
+class PlantSummary(BaseModel):
+    """Just enough of a plant record to draw it in a list."""
+    id: str
+    name: Optional[str] = None
+    common_name: Optional[str] = None
+    probability: Optional[float] = None
+    thumbnail_url: Optional[str] = None
+    datetime: Optional[str] = None
+
+class PlantLocation(PlantSummary):
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    distance: Optional[float] = None  # metres from the query point
+
+class PlantSearchResult(PlantSummary):
+    score: Optional[float] = None  # text relevance, higher is better
+
+class PlantPage(BaseModel):
+    items: List[PlantResponse]
+    next_cursor: Optional[str] = None
+
+class PlantSummaryPage(BaseModel):
+    items: List[PlantSummary]
+    next_cursor: Optional[str] = None
+
+class BulkDeleteRequest(BaseModel):
+    ids: List[str] = Field(..., max_length=500)
+
 class UpdateNotesRequest(BaseModel):
     id: str
     notes: str
+
+class IdentifyJob(BaseModel):
+    job_id: str
+    status: str  # pending | completed | failed
+    result: Optional[PlantResponse] = None
+    status_code: Optional[int] = None
+    detail: Optional[str] = None
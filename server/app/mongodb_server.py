@@ -1,14 +1,27 @@
-from pymongo.server_api import ServerApi
-import motor.motor_asyncio
 import os
 from dotenv import load_dotenv
+
+from .clients import LazyClient
 load_dotenv()
 
 MONGODB_URI = os.getenv("MONGODB_URI")
 DB_NAME   = os.getenv("MONGODB_DB_NAME", "plant_tracker")
 
-client = motor.motor_asyncio.AsyncIOMotorClient(
-    MONGODB_URI,
-    server_api=ServerApi("1")
-) 
-db = client[DB_NAME]
+
+def _connect():
+    # Imported here: motor is only needed once the app actually talks to Mongo
+    import motor.motor_asyncio
+    from pymongo.server_api import ServerApi
+
+    from .metrics import MongoCommandListener
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(
+        MONGODB_URI,
+        server_api=ServerApi("1"),
+        event_listeners=[MongoCommandListener()],
+    )
+    return client[DB_NAME]
+
+
+# Built on first use; the startup ping in main.lifespan does that off the event loop
+db = LazyClient("mongo", _connect, register=False)
@@ -0,0 +1,19 @@
+import base64
+import binascii
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+
+def encode_cursor(oid: ObjectId) -> str:
+    """Opaque, URL-safe token pointing just past ``oid`` in ``_id`` order."""
+    return base64.urlsafe_b64encode(oid.binary).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> ObjectId:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        return ObjectId(raw)
+    except (binascii.Error, InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,128 @@
+import logging
+import math
+import os
+import time
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from . import metrics
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Plant.id requests each user may start per minute, and how many at once (burst)
+USER_RATE_PER_MINUTE = float(os.getenv("IDENTIFY_USER_RATE_PER_MINUTE", "10"))
+USER_BURST = float(os.getenv("IDENTIFY_USER_BURST", "5"))
+# Shared by all users: protects the metered Plant.id key; 0 disables
+GLOBAL_RATE_PER_MINUTE = float(os.getenv("IDENTIFY_GLOBAL_RATE_PER_MINUTE", "120"))
+GLOBAL_BURST = float(os.getenv("IDENTIFY_GLOBAL_BURST", "30"))
+# Shed new identifications once this many calls wait for a Plant.id slot; 0 disables
+MAX_QUEUED = int(os.getenv("IDENTIFY_MAX_QUEUED", "16"))
+# memory (per worker) or mongo (shared by every worker)
+STORE = os.getenv("RATE_LIMIT_STORE", "memory").lower()
+# Buckets still refilling that one worker keeps in memory
+MEMORY_BUCKETS = int(os.getenv("RATE_LIMIT_MEMORY_BUCKETS", "100000"))
+
+rejections = metrics.Counter("rate_limited_total", "Requests rejected by admission control.", ("reason",))
+
+
+class MemoryBucketStore:
+    """Token buckets held in this process.
+
+    ``take`` never awaits, so it is atomic on the event loop without a lock.
+    A bucket expires once it would be full again, which is exactly the state
+    a missing bucket starts in, so idle users cost no memory.
+    """
+
+    def __init__(self, maxsize: int = MEMORY_BUCKETS):
+        self._buckets = LRUCache(maxsize)
+
+    async def take(self, db, key: str, capacity: float, rate: float, cost: float = 1) -> float:
+        """Take ``cost`` tokens; return 0 if allowed, else seconds until they would be."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets.set(key, (tokens, now), ttl=(capacity - tokens) / rate)
+        return 0.0 if allowed else (cost - tokens) / rate
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class MongoBucketStore:
+    """Token buckets in ``db.rate_limits``, updated atomically by one pipeline update.
+
+    Every worker shares the same buckets; the refill is computed from the
+    stored ``updated_at`` so no background job is needed.
+    """
+
+    async def take(self, db, key: str, capacity: float, rate: float, cost: float = 1) -> float:
+        now = datetime.now(timezone.utc)
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed, rate]}]}]}
+        doc = await db.rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc["allowed"]:
+            return 0.0
+        return (cost - doc["tokens"]) / rate
+
+    def clear(self):
+        pass
+
+
+def _make_store():
+    return MongoBucketStore() if STORE == "mongo" else MemoryBucketStore()
+
+
+store = _make_store()
+
+
+def _reject(reason: str, retry_after: float, detail: str):
+    rejections.inc(reason)
+    raise HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def admit_identification(db, user_id: str, engine):
+    """Admission control for Plant.id: shed load, then per-user and global rate limits.
+
+    Raises 429 with ``Retry-After`` when the request should not go ahead.
+    """
+    if MAX_QUEUED and engine.queued >= MAX_QUEUED:
+        # Roughly how long until the queue ahead of this request drains
+        wait = (engine.queued + 1) / engine.max_in_flight * engine.avg_call_seconds
+        _reject("overloaded", wait, "Identification is busy, please retry shortly")
+    try:
+        if USER_RATE_PER_MINUTE:
+            wait = await store.take(db, f"identify:user:{user_id}", USER_BURST, USER_RATE_PER_MINUTE / 60)
+            if wait:
+                _reject("user", wait, "Too many identification requests")
+        if GLOBAL_RATE_PER_MINUTE:
+            wait = await store.take(db, "identify:global", GLOBAL_BURST, GLOBAL_RATE_PER_MINUTE / 60)
+            if wait:
+                _reject("global", wait, "Identification quota exhausted, please retry later")
+    except HTTPException:
+        raise
+    except Exception:
+        # A broken limiter store must not take identification down with it
+        logger.warning("rate limit check failed, admitting request", exc_info=True)
+
+
+def clear():
+    store.clear()
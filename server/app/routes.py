@@ -1,51 +1,191 @@
+import asyncio
+import csv
+import hmac
+import io
+import json
 import os
-from concurrent.futures import ThreadPoolExecutor
-from fastapi import Depends, APIRouter, HTTPException, File, Form, UploadFile
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from datetime import datetime, timezone
+from fastapi import Depends, APIRouter, HTTPException, File, Form, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Union
 from bson import ObjectId
-from kindwise import PlantApi, PlantIdentification, ClassificationLevel
+
+if TYPE_CHECKING:
+    from kindwise import PlantIdentification
 
 from .mongodb_server import db
-from .models import PlantResponse, Suggestion, SimilarImage, UpdateNotesRequest
+from .models import (
+    PlantResponse, Suggestion, SimilarImage, UpdateNotesRequest, IdentifyJob, ImageRenditions,
+    PlantPage, PlantSummary, PlantSummaryPage, PlantLocation, PlantSearchResult, BulkDeleteRequest,
+)
 from .deps import get_current_user
-from .storage import upload_image_bytes, delete_image
+from .storage import upload_images
+from .identification import engine as identification_engine
+from .identify_cache import identification_cache, cache_key
+from .uploads import SpooledImage, spool_uploads, close_all
+from .images import render_all
+from .pagination import encode_cursor, decode_cursor
+from . import counters, deletion, geo, metrics, ratelimit, search, species
+from .http_cache import conditional_json
+from .clients import LazyClient
+from .serialization import FastJSONResponse, dumps, shape
 
 router = APIRouter(prefix="/api")
 
-# Initialize Plant.id client
-api_key = os.getenv("PLANT_ID_API_KEY")
-if not api_key:
-    raise RuntimeError("PLANT_ID_API_KEY not set in environment variables")
-plant_client = PlantApi(api_key=api_key)
+PAGE_SIZE = int(os.getenv("PLANTS_PAGE_SIZE", "10"))
+MAX_PAGE_SIZE = 100
+MAX_NEARBY_RESULTS = 500
+MAX_NEARBY_RADIUS = 20_000_000  # metres, about half the Earth's circumference
+MAX_SEARCH_RESULTS = 100
+
+def _plant_api():
+    # kindwise is imported on first use so it does not slow down startup
+    from kindwise import PlantApi
+
+    api_key = os.getenv("PLANT_ID_API_KEY")
+    if not api_key:
+        raise RuntimeError("PLANT_ID_API_KEY not set in environment variables")
+    return PlantApi(api_key=api_key)
+
+# Plant.id client, built on first use or while the app warms up
+plant_client = LazyClient("plant_id", _plant_api)
+
+DETAILS_TO_RETURN = [
+    'common_names', 'url', 'description', 'synonyms', 'edible_parts',
+    'propagation_methods', 'watering', 'best_watering', 'taxonomy',
+    'best_light_condition', 'best_soil_type', 'cultural_significance', 'image'
+]
 
 @router.post("/identify-plant")
 async def identify_plant(
     images: List[UploadFile] = File(...),
     latitude: Optional[float] = Form(None),
     longitude: Optional[float] = Form(None),
+    background: bool = False,
     user=Depends(get_current_user),
 ):
-    """Identify a plant from one or more uploaded images."""
+    """Identify a plant from one or more uploaded images.
+
+    With ``?background=true`` the identification is queued and a job id is
+    returned straight away; poll ``GET /api/identify-plant/{job_id}`` for it.
+    Answers 429 with ``Retry-After`` when the user or the shared Plant.id
+    quota is over its rate, or when too many calls are already queued.
+    """
+    await ratelimit.admit_identification(db, user["sub"], identification_engine)
+    with metrics.stage("read_uploads"):
+        spooled = await spool_uploads(images)
+    work = _identify_and_save(spooled, latitude, longitude, user["sub"])
+    if background:
+        job_id = identification_engine.submit(user["sub"], work)
+        return JSONResponse({"job_id": job_id, "status": "pending"}, status_code=202)
+    return FastJSONResponse(await work)
+
+@router.get("/identify-plant/{job_id}", response_model=IdentifyJob)
+async def get_identification_job(job_id: str, user=Depends(get_current_user)):
+    """Return the state of a background identification job."""
+    job = identification_engine.get_job(job_id, user["sub"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+async def _identify_and_save(images: List[SpooledImage], latitude, longitude, user_id) -> PlantResponse:
+    """Run the full identify pipeline: Plant.id, R2 upload and Mongo insert."""
+    try:
+        # Downscaled copies are what Plant.id sees and what lists display
+        with metrics.stage("render"):
+            rendered = await render_all(images)
+        key = cache_key([img.digest for img in images], latitude, longitude, DETAILS_TO_RETURN)
+        identified = await identification_cache.get_or_compute(
+            db, key, lambda: _call_plant_id([r["medium"] for r in rendered], latitude, longitude, user_id)
+        )
+
+        with metrics.stage("upload"):
+            image_urls, medium_urls, thumbnail_urls = await _upload_all(images, rendered)
+    finally:
+        close_all(images)
+
+    try:
+        response = PlantResponse(
+            user_id=user_id,
+            notes="",
+            image_urls=image_urls,
+            renditions=[
+                ImageRenditions(original=o, medium=m, thumbnail=t)
+                for o, m, t in zip(image_urls, medium_urls, thumbnail_urls)
+            ],
+            # Only the classification is shared; the record is dated now and the
+            # Plant.id access token only goes back to the user who asked for it
+            datetime=str(datetime.now(timezone.utc)),
+            access_token=identified.get("access_token") if identified.get("requested_by") == user_id else None,
+            **{k: identified.get(k) for k in CACHED_FIELDS},
+        )
+
+        # Immediately save to MongoDB; species details go to the shared catalog
+        with metrics.stage("db_insert"):
+            doc = response.model_dump(mode="json")
+            doc.update(search.search_fields(doc["suggestions"]))
+            doc["suggestions"] = await species.upsert_species(db, doc["suggestions"])
+            location = geo.point(response.latitude, response.longitude)
+            if location:
+                doc["location"] = location
+            result = await db.plants.insert_one(doc)
+    except BaseException:
+        # No plant owns the images: give their references back
+        await deletion.enqueue(db, image_urls + medium_urls + thumbnail_urls)
+        raise
+    response.id = str(result.inserted_id)
+    await counters.increment_plant_count(db, user_id)
+
+    return response
+
+async def _upload_all(images: List[SpooledImage], rendered: List[Dict[str, bytes]]):
+    """Upload originals and renditions in parallel; return their URL lists.
+
+    Content-addressed keys make re-identifying the same photo free. Each
+    upload takes an ``image_refs`` reference; if any upload fails, the ones
+    that succeeded are released through the deletion outbox.
+    """
+    n = len(images)
+    pending = (
+        [(img, img.content_type, "plants") for img in images]
+        + [(r["medium"], "image/jpeg", "plants/medium") for r in rendered]
+        + [(r["thumbnail"], "image/jpeg", "plants/thumbnail") for r in rendered]
+    )
+    results = await asyncio.gather(
+        *[upload_images([(data, ct)], prefix=prefix, db=db) for data, ct, prefix in pending],
+        return_exceptions=True,
+    )
+    failed = [r for r in results if isinstance(r, BaseException)]
+    urls = [url for r in results if not isinstance(r, BaseException) for url in r]
+    if failed:
+        await deletion.enqueue(db, urls)
+        raise failed[0]
+    return urls[:n], urls[n:2 * n], urls[2 * n:]
+
+# Parts of a Plant.id answer that depend only on the images and location
+CACHED_FIELDS = ("is_plant_boolean", "is_plant_probability", "suggestions", "latitude", "longitude")
+
+async def _call_plant_id(images: List[bytes], latitude, longitude, user_id: str) -> dict:
+    """Ask Plant.id about the images and return the cacheable part of the answer.
+
+    The access token is kept with the id of the user it was issued to.
+    """
+    from kindwise import ClassificationLevel
+
     try:
-        img_bytes_list = [await img.read() for img in images]
-        content_types = [img.content_type or "image/jpeg" for img in images]
-        details_to_return = [
-            'common_names', 'url', 'description', 'synonyms', 'edible_parts',
-            'propagation_methods', 'watering', 'best_watering', 'taxonomy',
-            'best_light_condition', 'best_soil_type', 'cultural_significance', 'image'
-        ]
         kwargs = {}
         if latitude is not None and longitude is not None:
             kwargs['latitude_longitude'] = (latitude, longitude)
-        identification: PlantIdentification = plant_client.identify(
-            img_bytes_list,
-            details=details_to_return,
-            language=['en'],
-            classification_level=ClassificationLevel.ALL,
-            **kwargs,
-        )
+        with metrics.stage("plant_id"):
+            identification: "PlantIdentification" = await identification_engine.run(
+                plant_client.identify,
+                images,
+                details=DETAILS_TO_RETURN,
+                language=['en'],
+                classification_level=ClassificationLevel.ALL,
+                max_image_size=None,  # already downscaled by render_all
+                **kwargs,
+            )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Identification failed: {e}")
 
@@ -57,6 +197,32 @@ async def identify_plant(
             detail="Identification incomplete or missing classification"
         )
 
+    with metrics.stage("suggestions"):
+        suggestions = [s.model_dump(mode="json") for s in _build_suggestions(identification)]
+    return {
+        "access_token": identification.access_token,
+        "requested_by": user_id,
+        "is_plant_boolean": identification.result.is_plant.binary,
+        "is_plant_probability": identification.result.is_plant.probability,
+        "suggestions": suggestions,
+        "latitude": identification.input.latitude,
+        "longitude": identification.input.longitude,
+    }
+
+def stored_image_urls(doc: dict) -> List[str]:
+    """Every storage URL a plant document owns, renditions included.
+
+    Imported records only reference their images, so deleting them must not
+    remove objects that may belong to someone else.
+    """
+    if doc.get("images_owned") is False:
+        return []
+    urls = list(doc.get("image_urls") or [])
+    for r in doc.get("renditions") or []:
+        urls.extend(u for u in (r.get("medium"), r.get("thumbnail")) if u)
+    return urls
+
+def _build_suggestions(identification: "PlantIdentification") -> List[Suggestion]:
     suggestions: List[Suggestion] = []
     for s in identification.result.classification.suggestions or []:
         details = s.details
@@ -67,7 +233,7 @@ async def identify_plant(
             id=s.id,
             name=s.name.title(),
             probability=s.probability,
-            common_names=[c.title() for c in details.get('common_names')],
+            common_names=[c.title() for c in details.get('common_names') or []],
             taxonomy=details.get('taxonomy'),
             url=details.get('url'),
             description=desc,
@@ -82,45 +248,21 @@ async def identify_plant(
             similar_images=[SimilarImage(url=img.url, similarity=img.similarity)
                              for img in (s.similar_images or [])]
         ))
-
-    # Upload images to R2 in a thread pool (boto3 is synchronous)
-    loop = __import__('asyncio').get_event_loop()
-    with ThreadPoolExecutor() as pool:
-        image_urls = list(await loop.run_in_executor(
-            pool,
-            lambda: [upload_image_bytes(b, ct) for b, ct in zip(img_bytes_list, content_types)]
-        ))
-
-    response = PlantResponse(
-        user_id=user["sub"],
-        access_token=identification.access_token,
-        is_plant_boolean=identification.result.is_plant.binary,
-        is_plant_probability=identification.result.is_plant.probability,
-        suggestions=suggestions,
-        notes="",
-        datetime=str(identification.input.datetime),
-        latitude=identification.input.latitude,
-        longitude=identification.input.longitude,
-        image_urls=image_urls,
-    )
-
-    # Immediately save to MongoDB
-    doc = jsonable_encoder(response)
-    result = await db.plants.insert_one(doc)
-    response.id = str(result.inserted_id)
-
-    return response
+    return suggestions
 
 @router.put("/update-plant-notes")
 async def update_plant_notes(request: UpdateNotesRequest):
     if not ObjectId.is_valid(request.id):
         raise HTTPException(status_code=400, detail="Invalid plant ID")
-    result = await db.plants.update_one(
+    doc = await db.plants.find_one_and_update(
         {"_id": ObjectId(request.id)},
-        {"$set": {"notes": request.notes}}
+        {"$set": {"notes": request.notes}},
+        projection={"user_id": 1},
     )
-    if result.matched_count == 0:
+    if doc is None:
         raise HTTPException(status_code=404, detail="Plant not found")
+    if doc.get("user_id"):
+        await counters.bump_version(db, doc["user_id"])
     return {"id": request.id, "notes": request.notes}
 
 @router.delete("/delete-plant/{plant_id}")
@@ -128,38 +270,353 @@ async def delete_plant(plant_id: str, user=Depends(get_current_user)):
     """Delete a plant record by id for the current user."""
     if not ObjectId.is_valid(plant_id):
         raise HTTPException(status_code=400, detail="Invalid plant ID")
-    doc = await db.plants.find_one({"_id": ObjectId(plant_id), "user_id": user["sub"]}, {"image_urls": 1})
+    doc = await db.plants.find_one(
+        {"_id": ObjectId(plant_id), "user_id": user["sub"]},
+        {"image_urls": 1, "renditions": 1, "images_owned": 1},
+    )
     if not doc:
         raise HTTPException(status_code=404, detail="Plant not found")
-    await db.plants.delete_one({"_id": ObjectId(plant_id)})
-    loop = __import__('asyncio').get_event_loop()
-    with ThreadPoolExecutor() as pool:
-        await loop.run_in_executor(
-            pool,
-            lambda: [delete_image(url) for url in (doc.get("image_urls") or [])]
-        )
+    result = await db.plants.delete_one({"_id": ObjectId(plant_id)})
+    if result.deleted_count:
+        await counters.increment_plant_count(db, user["sub"], -1)
+    # Images are removed by the background deletion worker
+    await deletion.enqueue(db, stored_image_urls(doc))
     return {"id": plant_id}
 
+@router.post("/delete-plants")
+async def delete_plants(request: BulkDeleteRequest, user=Depends(get_current_user)):
+    """Delete many of the current user's plants at once; returns the ids removed."""
+    if not all(ObjectId.is_valid(pid) for pid in request.ids):
+        raise HTTPException(status_code=400, detail="Invalid plant ID")
+    oids = [ObjectId(pid) for pid in dict.fromkeys(request.ids)]
+    docs = await db.plants.find(
+        {"_id": {"$in": oids}, "user_id": user["sub"]},
+        {"image_urls": 1, "renditions": 1, "images_owned": 1},
+    ).to_list(length=len(oids))
+    if not docs:
+        return {"ids": []}
+    result = await db.plants.delete_many(
+        {"_id": {"$in": [d["_id"] for d in docs]}, "user_id": user["sub"]}
+    )
+    if result.deleted_count:
+        await counters.increment_plant_count(db, user["sub"], -result.deleted_count)
+    await deletion.enqueue(db, [url for d in docs for url in stored_image_urls(d)])
+    return {"ids": [str(d["_id"]) for d in docs]}
+
 # --- Fetch Plants ---
 @router.get("/my-plants/count")
-async def get_plants_count(user=Depends(get_current_user)):
-    count = await db.plants.count_documents({"user_id": user["sub"]})
-    return {"count": count}
-
-@router.get("/my-plants", response_model=List[PlantResponse])
-async def get_plants(user=Depends(get_current_user), page: int = 1):
-    page_size = 10
-    skip = (page - 1) * page_size
-    cursor = db.plants.find(
-        {"user_id": user["sub"]},
-        {"image_data": 0}
-    ).sort("_id", -1).skip(skip).limit(page_size)
-    docs = await cursor.to_list(length=page_size)
+async def get_plants_count(request: Request, user=Depends(get_current_user)):
+    async def build():
+        return {"count": await counters.get_plant_count(db, user["sub"])}
+    return await conditional_json(request, db, user["sub"], build)
+
+# Server-side projection for view=summary: only the top suggestion and a thumbnail
+SUMMARY_PROJECTION = {
+    "_id": 1,
+    "datetime": 1,
+    "name": {"$arrayElemAt": ["$suggestions.name", 0]},
+    "common_name": {"$arrayElemAt": [{"$arrayElemAt": ["$suggestions.common_names", 0]}, 0]},
+    "probability": {"$arrayElemAt": ["$suggestions.probability", 0]},
+    "thumbnail_url": {"$ifNull": [
+        {"$arrayElemAt": ["$renditions.thumbnail", 0]},
+        {"$arrayElemAt": ["$image_urls", 0]},
+    ]},
+}
+
+@router.get(
+    "/my-plants",
+    response_model=Union[PlantPage, PlantSummaryPage, List[PlantResponse], List[PlantSummary]],
+)
+async def get_plants(
+    request: Request,
+    user=Depends(get_current_user),
+    page: int = Query(1, ge=1),
+    after: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    view: Literal["full", "summary"] = "full",
+):
+    """Return the user's plants, newest first.
+
+    Pass ``after`` (empty for the first page, then each ``next_cursor``) for
+    keyset pagination. Without it, ``page`` keeps the old skip-based paging
+    and a plain list is returned. ``view=summary`` returns compact
+    ``PlantSummary`` items; fetch ``/api/plants/{id}`` for the full record.
+    Responses carry an ETag and unchanged pages are answered with 304.
+    """
+    return await conditional_json(
+        request, db, user["sub"],
+        lambda: _load_plants(user["sub"], page, after, limit, view),
+    )
+
+async def _load_plants(user_id: str, page: int, after: Optional[str], limit: int, view: str):
+    query = {"user_id": user_id}
+    if after:
+        query["_id"] = {"$lt": decode_cursor(after)}
+    projection = SUMMARY_PROJECTION if view == "summary" else {"image_data": 0}
+    cursor = db.plants.find(query, projection).sort("_id", -1)
+    if after is None:
+        cursor = cursor.skip((page - 1) * limit)
+    # Fetch one extra document to learn whether another page exists
+    docs = await cursor.limit(limit + 1).to_list(length=limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if view == "full":
+        await species.hydrate(db, docs)
+    model = PlantSummary if view == "summary" else PlantResponse
+    results = []
+    for doc in docs:
+        doc["id"] = str(doc.get("_id"))
+        results.append(shape(model, doc))
+    if after is None:
+        return results
+    next_cursor = encode_cursor(docs[-1]["_id"]) if has_more else None
+    # Same shape as PlantPage / PlantSummaryPage
+    return {"items": results, "next_cursor": next_cursor}
+
+@router.get("/my-plants/nearby", response_model=List[PlantLocation])
+async def get_plants_nearby(
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    radius: float = Query(5000, gt=0, le=MAX_NEARBY_RADIUS),
+    bbox: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_NEARBY_RESULTS),
+    user=Depends(get_current_user),
+):
+    """Find the user's plants near a point or inside a bounding box.
+
+    With ``latitude``/``longitude`` results are the closest plants within
+    ``radius`` metres, nearest first (2dsphere index). ``bbox=min_lng,min_lat,max_lng,max_lat``
+    returns plants inside the box instead; ``min_lng > max_lng`` crosses the
+    antimeridian.
+    """
+    projection = {**SUMMARY_PROJECTION, "latitude": 1, "longitude": 1}
+    if bbox is not None:
+        docs = await db.plants.find(
+            {"user_id": user["sub"], **geo.bbox_filter(bbox)},
+            projection,
+        ).limit(limit).to_list(length=limit)
+    else:
+        near = geo.point(latitude, longitude)
+        if near is None:
+            raise HTTPException(status_code=400, detail="latitude and longitude or bbox are required")
+        pipeline = [
+            {"$geoNear": {
+                "near": near,
+                "key": "location",
+                "distanceField": "distance",
+                "maxDistance": radius,
+                "query": {"user_id": user["sub"]},
+                "spherical": True,
+            }},
+            {"$limit": limit},
+            {"$project": {**projection, "distance": 1}},
+        ]
+        docs = await db.plants.aggregate(pipeline).to_list(length=limit)
+    results = []
+    for doc in docs:
+        doc["id"] = str(doc.get("_id"))
+        results.append(shape(PlantLocation, doc))
+    return FastJSONResponse(results)
+
+@router.get("/my-plants/search", response_model=List[PlantSearchResult])
+async def search_plants(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    user=Depends(get_current_user),
+):
+    """Full-text search over plant names, common names, synonyms and notes.
+
+    Served by the ``(user_id, text)`` index and ranked by text score; name
+    matches weigh more than notes. Only list fields are read back.
+    """
+    docs = await db.plants.find(
+        {"user_id": user["sub"], "$text": {"$search": q}},
+        {**SUMMARY_PROJECTION, "score": {"$meta": "textScore"}},
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit).to_list(length=limit)
+    results = []
+    for doc in docs:
+        doc["id"] = str(doc.get("_id"))
+        results.append(shape(PlantSearchResult, doc))
+    return FastJSONResponse(results)
+
+@router.get("/my-plants/autocomplete", response_model=List[PlantSummary])
+async def autocomplete_plants(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS),
+    user=Depends(get_current_user),
+):
+    """Type-ahead: plants with a name or name word starting with ``q``, newest first."""
+    prefix = search.prefix_query(q)
+    if prefix is None:
+        return []
+    docs = await db.plants.find(
+        {"user_id": user["sub"], "search_keys": prefix}, SUMMARY_PROJECTION
+    ).sort("_id", -1).limit(limit).to_list(length=limit)
     results = []
     for doc in docs:
         doc["id"] = str(doc.get("_id"))
-        results.append(PlantResponse(**doc))
-    return results
+        results.append(shape(PlantSummary, doc))
+    return FastJSONResponse(results)
+
+@router.get("/plants/{plant_id}", response_model=PlantResponse)
+async def get_plant(plant_id: str, user=Depends(get_current_user)):
+    """Return one full plant record owned by the current user."""
+    if not ObjectId.is_valid(plant_id):
+        raise HTTPException(status_code=400, detail="Invalid plant ID")
+    doc = await db.plants.find_one(
+        {"_id": ObjectId(plant_id), "user_id": user["sub"]}, {"image_data": 0}
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Plant not found")
+    await species.hydrate(db, [doc])
+    doc["id"] = str(doc.get("_id"))
+    return FastJSONResponse(shape(PlantResponse, doc))
+
+# --- Export / Import ---
+EXPORT_BATCH_SIZE = 200
+IMPORT_CHUNK_SIZE = 500
+IMPORT_MAX_ERRORS = 50
+EXPORT_FIELDS = [f for f in PlantResponse.model_fields if f not in ("user_id", "image_data")]
+CSV_COLUMNS = [
+    "id", "datetime", "name", "common_name", "probability",
+    "latitude", "longitude", "notes", "image_urls",
+]
+
+async def _export_batches(user_id: str):
+    """Yield the user's plants oldest first, species joined, a batch at a time."""
+    cursor = db.plants.find({"user_id": user_id}, {"image_data": 0}).sort("_id", 1)
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield await species.hydrate(db, batch)
+            batch = []
+    if batch:
+        yield await species.hydrate(db, batch)
+
+def _export_record(doc: dict) -> dict:
+    doc["id"] = str(doc.get("_id"))
+    return {f: doc.get(f) for f in EXPORT_FIELDS}
+
+async def _ndjson_lines(user_id: str):
+    async for batch in _export_batches(user_id):
+        yield b"".join(dumps(_export_record(d)) + b"\n" for d in batch)
+
+async def _csv_lines(user_id: str):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_COLUMNS)
+    async for batch in _export_batches(user_id):
+        for doc in batch:
+            rec = _export_record(doc)
+            top = (rec.get("suggestions") or [{}])[0]
+            writer.writerow([
+                rec["id"], rec.get("datetime"), top.get("name"),
+                (top.get("common_names") or [None])[0], top.get("probability"),
+                rec.get("latitude"), rec.get("longitude"), rec.get("notes"),
+                " ".join(rec.get("image_urls") or []),
+            ])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+@router.get("/my-plants/export")
+async def export_plants(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    user=Depends(get_current_user),
+):
+    """Stream every plant of the current user as NDJSON (default) or CSV."""
+    if format == "csv":
+        body, media_type = _csv_lines(user["sub"]), "text/csv"
+    else:
+        body, media_type = _ndjson_lines(user["sub"]), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="plants.{format}"'},
+    )
+
+async def _ndjson_records(request: Request):
+    """Parse an NDJSON request body as it streams in, yielding (line_no, record|error)."""
+    buffer = b""
+    line_no = 0
+
+    def parse(line: bytes):
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            return ValueError(f"Invalid JSON: {e}")
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, parse(line)
+    if buffer.strip():
+        yield line_no + 1, parse(buffer)
+
+@router.post("/my-plants/import")
+async def import_plants(request: Request, user=Depends(get_current_user)):
+    """Bulk import plants from an NDJSON body, e.g. one produced by the export.
+
+    Records are validated and written in chunks with unordered
+    ``insert_many``; invalid lines are reported and skipped. Imported
+    suggestions stay inline on the plant and never touch the shared species
+    catalog, which other users' plants are joined against.
+    """
+    imported = 0
+    errors = []
+    chunk: List[dict] = []
+
+    async def flush():
+        nonlocal imported
+        result = await db.plants.insert_many(chunk, ordered=False)
+        imported += len(result.inserted_ids)
+        chunk.clear()
+
+    async for line_no, record in _ndjson_records(request):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise ValueError("Expected a JSON object")
+            plant = PlantResponse(**record)
+        except (ValueError, TypeError) as e:
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append({"line": line_no, "detail": str(e)})
+            continue
+        doc = plant.model_dump(mode="json", exclude={"id", "image_data"})
+        doc["user_id"] = user["sub"]
+        doc["images_owned"] = False
+        doc["suggestions"] = doc.get("suggestions") or []
+        doc.update(search.search_fields(doc["suggestions"]))
+        location = geo.point(plant.latitude, plant.longitude)
+        if location:
+            doc["location"] = location
+        chunk.append(doc)
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+    if imported:
+        await counters.increment_plant_count(db, user["sub"], imported)
+    return {"imported": imported, "errors": errors}
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus text exposition of request, stage, Mongo and storage metrics.
+
+    Open by default; set ``METRICS_TOKEN`` to require it as a bearer token.
+    """
+    token = os.getenv("METRICS_TOKEN")
+    supplied = request.headers.get("authorization", "")
+    if token and not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @router.get("/auth/me")
 async def me(user=Depends(get_current_user)):
@@ -0,0 +1,49 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+# Relative text index weights: a name hit outranks a mention in the notes
+TEXT_WEIGHTS = {"search_names": 10, "notes": 1}
+# Longest prefix stored per key; longer type-ahead input is truncated to it
+MAX_KEY_LENGTH = 40
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents so 'Pothos' and 'pothós' share keys."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def _names(suggestion: Dict[str, Any]) -> List[str]:
+    names = [suggestion.get("name")]
+    names += suggestion.get("common_names") or []
+    names += suggestion.get("synonyms") or []
+    return [n for n in names if isinstance(n, str) and n.strip()]
+
+
+def search_fields(suggestions: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Denormalized search fields for a plant from its full (unsplit) suggestions.
+
+    ``search_names`` feeds the text index; ``search_keys`` holds the whole
+    names and each of their words, normalized, for prefix type-ahead.
+    Only the top suggestion is indexed, matching what the list shows.
+    """
+    names = _names(suggestions[0]) if suggestions else []
+    keys = set()
+    for name in names:
+        norm = normalize(name)
+        keys.add(" ".join(_WORD.findall(norm))[:MAX_KEY_LENGTH])
+        keys.update(w[:MAX_KEY_LENGTH] for w in _WORD.findall(norm))
+    keys.discard("")
+    return {"search_names": " ".join(names), "search_keys": sorted(keys)}
+
+
+def prefix_query(prefix: str) -> Optional[Dict[str, Any]]:
+    """Anchored regex over ``search_keys``, which Mongo answers from the index."""
+    words = _WORD.findall(normalize(prefix))
+    if not words:
+        return None
+    key = " ".join(words)[:MAX_KEY_LENGTH]
+    return {"$regex": "^" + re.escape(key)}
@@ -0,0 +1,104 @@
+"""Fast JSON encoding for documents the server validated when it wrote them.
+
+Plant records are validated by Pydantic on the way into Mongo (identify and
+import). Reading them back through ``PlantResponse(**doc)`` and then again
+through ``response_model``/``jsonable_encoder`` repeats that work on every
+list request. With ``TRUSTED_SERIALIZATION`` on (the default) documents are
+only reshaped to the model's fields and defaults, then encoded with orjson.
+"""
+import json
+import os
+import typing
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from bson import ObjectId
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:  # optional: falls back to the standard library encoder
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+TRUSTED = os.getenv("TRUSTED_SERIALIZATION", "1") == "1"
+
+
+def _default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode ``obj`` (plain data and/or Pydantic models) as compact JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` encoded with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# (field name, default factory, nested model, is a list of that model)
+_Field = Tuple[str, typing.Callable[[], Any], Optional[Type[BaseModel]], bool]
+
+
+def _nested(annotation) -> Tuple[Optional[Type[BaseModel]], bool]:
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union and len(args) == 1:
+        return _nested(args[0])
+    if origin in (list, List) and args:
+        model, _ = _nested(args[0])
+        return model, model is not None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None, False
+
+
+@lru_cache(maxsize=None)
+def _fields(model: Type[BaseModel]) -> Tuple[_Field, ...]:
+    fields = []
+    for name, info in model.model_fields.items():
+        if info.default_factory is not None:
+            default = info.default_factory
+        else:
+            value = info.default
+            default = (lambda v=value: list(v) if isinstance(v, list) else v)
+        nested, is_list = _nested(info.annotation)
+        fields.append((name, default, nested, is_list))
+    return tuple(fields)
+
+
+def trusted_dump(model: Type[BaseModel], doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a stored document like ``model(**doc).model_dump(mode="json")``.
+
+    Keeps only the model's fields, fills in defaults and recurses into nested
+    models, without validating values. Only for data validated on write.
+    """
+    out = {}
+    for name, default, nested, is_list in _fields(model):
+        value = doc.get(name) if name in doc else default()
+        if nested is not None and value is not None:
+            if is_list:
+                value = [trusted_dump(nested, v) for v in value]
+            else:
+                value = trusted_dump(nested, value)
+        out[name] = value
+    return out
+
+
+def shape(model: Type[BaseModel], doc: Dict[str, Any]):
+    """Response item for ``doc``: a plain dict when trusted, else a validated model."""
+    if TRUSTED:
+        return trusted_dump(model, doc)
+    return model(**doc)
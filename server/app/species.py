@@ -0,0 +1,80 @@
+import os
+from typing import Any, Dict, List, Tuple
+
+from pymongo import UpdateOne
+
+from .cache import LRUCache
+
+SPECIES_CACHE_SIZE = int(os.getenv("SPECIES_CACHE_SIZE", "2048"))
+SPECIES_CACHE_TTL_SECONDS = float(os.getenv("SPECIES_CACHE_TTL_SECONDS", "3600"))
+
+# Kept on each plant record: enough to list, search and rank suggestions.
+# similar_images depend on the user's photo, not the species, so they stay too.
+REFERENCE_FIELDS = ("id", "name", "common_names", "probability", "similar_images")
+
+_cache = LRUCache(SPECIES_CACHE_SIZE, SPECIES_CACHE_TTL_SECONDS)
+
+
+def split_suggestion(suggestion: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Split a suggestion into its per-plant reference and shared species details."""
+    ref = {k: suggestion.get(k) for k in REFERENCE_FIELDS if k in suggestion}
+    details = {
+        k: v for k, v in suggestion.items()
+        if k not in ("id", "probability", "similar_images")
+    }
+    return ref, details
+
+
+async def upsert_species(db, suggestions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Save species details to the catalog and return the slim suggestion refs."""
+    refs = []
+    ops = []
+    for suggestion in suggestions:
+        ref, details = split_suggestion(suggestion)
+        refs.append(ref)
+        if _cache.get(ref["id"]) != details:
+            ops.append(UpdateOne({"_id": ref["id"]}, {"$set": details}, upsert=True))
+            _cache.set(ref["id"], details)
+    if ops:
+        await db.species.bulk_write(ops, ordered=False)
+    return refs
+
+
+async def get_species(db, species_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Look up species details, serving hot entries from the in-process cache."""
+    found: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    for sid in dict.fromkeys(species_ids):
+        details = _cache.get(sid)
+        if details is None:
+            missing.append(sid)
+        else:
+            found[sid] = details
+    if missing:
+        docs = await db.species.find({"_id": {"$in": missing}}).to_list(length=None)
+        for doc in docs:
+            sid = doc.pop("_id")
+            _cache.set(sid, doc)
+            found[sid] = doc
+    return found
+
+
+async def hydrate(db, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Join species details back into the suggestions of plant documents in place.
+
+    Fields stored on the plant record win, so documents written before the
+    catalog existed (with full inline suggestions) come back unchanged.
+    """
+    ids = [s["id"] for doc in docs for s in (doc.get("suggestions") or []) if s.get("id")]
+    if not ids:
+        return docs
+    catalog = await get_species(db, ids)
+    for doc in docs:
+        doc["suggestions"] = [
+            {**catalog.get(s.get("id"), {}), **s} for s in (doc.get("suggestions") or [])
+        ]
+    return docs
+
+
+def clear_cache():
+    _cache.clear()
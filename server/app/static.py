@@ -0,0 +1,163 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response
+
+try:  # optional: Brotli variants are only built and served when installed
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Build .gz/.br siblings for the bundle at startup when they are missing
+PRECOMPRESS = os.getenv("STATIC_PRECOMPRESS", "1") == "1"
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1000"))
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".webmanifest", ".ico"}
+# Vite content-hashes everything it emits under assets/ (e.g. index-CL-fMbuQ.js);
+# files copied from public/ keep their own names
+HASHED_DIR = "assets/"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _accepted(headers: Headers) -> set:
+    return {e.split(";")[0].strip() for e in headers.get("accept-encoding", "").split(",")}
+
+
+def precompress(directory: str) -> int:
+    """Write ``.gz`` (and ``.br`` with brotli installed) next to text assets.
+
+    Variants newer than their source are kept, so restarts are cheap.
+    Returns the number of files written.
+    """
+    written = 0
+    for path in Path(directory).rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE:
+            continue
+        source_mtime = path.stat().st_mtime
+        data = None
+        for encoding, suffix in ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            target = path.with_name(path.name + suffix)
+            if target.exists() and target.stat().st_mtime >= source_mtime:
+                continue
+            data = path.read_bytes() if data is None else data
+            compressed = _compress(data, encoding)
+            if len(compressed) >= len(data):
+                continue
+            try:
+                target.write_bytes(compressed)
+            except OSError as e:
+                logger.warning("cannot write %s: %s", target, e)
+                return written
+            written += 1
+    return written
+
+
+class IndexPage:
+    """``index.html`` held in memory with its compressed forms and ETag."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.body = Path(path).read_bytes()
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+        self.variants: Dict[str, bytes] = {"gzip": _compress(self.body, "gzip")}
+        if brotli is not None:
+            self.variants["br"] = _compress(self.body, "br")
+
+    def response(self, headers: Headers) -> Response:
+        common = {"ETag": self.etag, "Cache-Control": REVALIDATE, "Vary": "Accept-Encoding"}
+        if self.etag in headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=common)
+        accepted = _accepted(headers)
+        for encoding, _ in ENCODINGS:
+            if encoding in accepted and encoding in self.variants:
+                return Response(
+                    self.variants[encoding], media_type="text/html",
+                    headers={**common, "Content-Encoding": encoding},
+                )
+        return Response(self.body, media_type="text/html", headers=common)
+
+
+class SPAStaticFiles(StaticFiles):
+    """Serve the built client: precompressed variants, long-lived hashed assets.
+
+    Paths that are not files get the in-memory ``index.html`` so client-side
+    routing works on refresh or direct visits.
+    """
+
+    def __init__(self, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.index = IndexPage(os.path.join(directory, "index.html"))
+
+    async def get_response(self, path: str, scope) -> Response:
+        headers = Headers(scope=scope)
+        if path.startswith("api/"):
+            raise HTTPException(status_code=404)
+        if path in ("", ".", "index.html"):
+            return self.index.response(headers)
+        try:
+            response = await self._variant_response(path, scope, headers)
+            if response is None:
+                response = await super().get_response(path, scope)
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+            return self.index.response(headers)
+        if response.status_code == 404:
+            return self.index.response(headers)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE if path.startswith(HASHED_DIR) else REVALIDATE
+        return response
+
+    async def _variant_response(self, path: str, scope, headers: Headers) -> Optional[Response]:
+        if os.path.splitext(path)[1] not in COMPRESSIBLE:
+            return None
+        accepted = _accepted(headers)
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = self.lookup_path(path + suffix)
+            if stat_result is None:
+                continue
+            response = self.file_response(full_path, stat_result, scope)
+            # Type of the original file, not of the .gz/.br sibling
+            response.headers["Content-Type"] = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            response.headers["Content-Encoding"] = encoding
+            response.headers["Vary"] = "Accept-Encoding"
+            return response
+        return None
+
+
+class ApiGZipMiddleware(GZipMiddleware):
+    """Gzip API responses; the SPA bundle is already served precompressed."""
+
+    def __init__(self, app, minimum_size: int = GZIP_MIN_SIZE, compresslevel: int = GZIP_LEVEL):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/api/"):
+            await super().__call__(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
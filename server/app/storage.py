@@ -1,40 +1,272 @@
+import asyncio
 import os
-import base64
-import uuid
-import boto3
-from botocore.config import Config
-
-def _client():
-    account_id = os.getenv("R2_ACCOUNT_ID")
-    return boto3.client(
-        "s3",
-        endpoint_url=f"https://{account_id}.r2.cloudflarestorage.com",
-        aws_access_key_id=os.getenv("R2_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("R2_SECRET_ACCESS_KEY"),
-        config=Config(signature_version="s3v4"),
-        region_name="auto",
-    )
+from abc import ABC, abstractmethod
+import binascii
+import hashlib
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Iterable, List, Optional, Tuple, Union
 
-def upload_image_bytes(image_bytes: bytes, content_type: str = "image/jpeg", prefix: str = "plants") -> str:
-    """Upload raw image bytes to R2, return its public URL."""
+from . import image_refs, metrics
+from .metrics import instrument_boto_client
+
+# Size of the shared upload/delete pool and of the HTTP connection pool behind it
+STORAGE_MAX_WORKERS = int(os.getenv("STORAGE_MAX_WORKERS", "16"))
+# Files above this size are sent to R2 with S3 multipart upload
+MULTIPART_THRESHOLD = int(os.getenv("STORAGE_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+# Decoded base64 uploads stay in memory up to this size, then spill to disk
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+ImageData = Union[bytes, BinaryIO]
+
+uploads = metrics.Counter(
+    "storage_uploads_total", "Images written to storage, or skipped because they were already stored.", ("result",)
+)
+
+
+class StorageBackend(ABC):
+    """Interface implemented by every image store."""
+
+    @abstractmethod
+    def put(self, key: str, data: ImageData, content_type: str) -> None:
+        """Store ``data`` (bytes or a binary file object) under ``key``."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    def warm(self) -> None:
+        """Build connections/clients ahead of the first request."""
+
+    def delete_many(self, keys: List[str]) -> None:
+        for key in keys:
+            self.delete(key)
+
+    @abstractmethod
+    def public_base_url(self) -> str:
+        ...
+
+    def public_url(self, key: str) -> str:
+        return f"{self.public_base_url()}/{key}"
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        """Return the object key for one of our public URLs, or ``None``."""
+        base = self.public_base_url()
+        if not url.startswith(base + "/"):
+            return None
+        return url[len(base) + 1:]
+
+
+class R2Backend(StorageBackend):
+    """Cloudflare R2 via a single long-lived boto3 client."""
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # boto3 clients are thread-safe once built; building one is not cheap
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    account_id = os.getenv("R2_ACCOUNT_ID")
+                    self._client = instrument_boto_client(boto3.client(
+                        "s3",
+                        endpoint_url=f"https://{account_id}.r2.cloudflarestorage.com",
+                        aws_access_key_id=os.getenv("R2_ACCESS_KEY_ID"),
+                        aws_secret_access_key=os.getenv("R2_SECRET_ACCESS_KEY"),
+                        config=Config(
+                            signature_version="s3v4",
+                            max_pool_connections=STORAGE_MAX_WORKERS,
+                            retries={"max_attempts": 3, "mode": "standard"},
+                            tcp_keepalive=True,
+                        ),
+                        region_name="auto",
+                    ))
+        return self._client
+
+    def warm(self) -> None:
+        self.client
+
+    @property
+    def bucket(self) -> str:
+        return os.getenv("R2_BUCKET_NAME")
+
+    def put(self, key: str, data: ImageData, content_type: str) -> None:
+        if isinstance(data, bytes):
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type)
+            return
+        from boto3.s3.transfer import TransferConfig
+
+        data.seek(0)
+        self.client.upload_fileobj(
+            data, self.bucket, key,
+            ExtraArgs={"ContentType": content_type},
+            Config=TransferConfig(multipart_threshold=MULTIPART_THRESHOLD, use_threads=False),
+        )
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def delete_many(self, keys: List[str]) -> None:
+        # DeleteObjects accepts at most 1000 keys per call
+        for i in range(0, len(keys), 1000):
+            chunk = keys[i:i + 1000]
+            resp = self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in chunk], "Quiet": True},
+            )
+            if resp.get("Errors"):
+                err = resp["Errors"][0]
+                raise RuntimeError(
+                    f"Failed to delete {len(resp['Errors'])} objects, e.g. {err.get('Key')}: {err.get('Message')}"
+                )
+
+    def public_base_url(self) -> str:
+        return os.getenv("R2_PUBLIC_URL", "").rstrip("/")
+
+
+class LocalBackend(StorageBackend):
+    """Store images on the local filesystem, e.g. for development and benchmarks."""
+
+    def __init__(self, root: Optional[str] = None, public_url: Optional[str] = None):
+        self.root = Path(root or os.getenv("LOCAL_STORAGE_DIR", "local-storage")).resolve()
+        self._public_url = (public_url or os.getenv("LOCAL_STORAGE_URL") or self.root.as_uri()).rstrip("/")
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def put(self, key: str, data: ImageData, content_type: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(data, bytes):
+            path.write_bytes(data)
+            return
+        data.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(data, f)
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def public_base_url(self) -> str:
+        return self._public_url
+
+
+_backend: Optional[StorageBackend] = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_backend() -> StorageBackend:
+    """Return the configured backend (``STORAGE_BACKEND=r2|local``)."""
+    global _backend
+    if _backend is None:
+        kind = os.getenv("STORAGE_BACKEND", "r2").lower()
+        _backend = LocalBackend() if kind == "local" else R2Backend()
+    return _backend
+
+
+def set_backend(backend: Optional[StorageBackend]):
+    """Swap the active backend; ``None`` falls back to the environment setting."""
+    global _backend
+    _backend = backend
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the app-lifetime pool used for blocking storage calls."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=STORAGE_MAX_WORKERS, thread_name_prefix="storage")
+    return _executor
+
+
+async def warm():
+    """Build the backend and its client off the event loop during startup."""
+    await asyncio.get_running_loop().run_in_executor(get_executor(), lambda: get_backend().warm())
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _digest(data: ImageData) -> str:
+    # Spooled uploads were already hashed while they were validated
+    digest = getattr(data, "digest", None)
+    if digest:
+        return digest
+    if isinstance(data, bytes):
+        return hashlib.sha256(data).hexdigest()
+    data.seek(0)
+    h = hashlib.sha256()
+    while chunk := data.read(1024 * 1024):
+        h.update(chunk)
+    data.seek(0)
+    return h.hexdigest()
+
+
+def content_key(data: ImageData, content_type: str, prefix: str) -> str:
+    """Key derived from the image bytes, so identical images share one object."""
     ext = content_type.split("/")[-1]
     if ext == "jpeg":
         ext = "jpg"
-    key = f"{prefix}/{uuid.uuid4()}.{ext}"
-    bucket = os.getenv("R2_BUCKET_NAME")
+    return f"{prefix}/{_digest(data)}.{ext}"
+
+
+def _put_missing(key: str, data: ImageData, content_type: str, known_stored: bool = False):
+    backend = get_backend()
+    if known_stored or backend.exists(key):
+        uploads.inc("deduplicated")
+        return
+    backend.put(key, data, content_type)
+    uploads.inc("uploaded")
 
-    _client().put_object(
-        Bucket=bucket,
-        Key=key,
-        Body=image_bytes,
-        ContentType=content_type,
-    )
 
-    public_url = os.getenv("R2_PUBLIC_URL", "").rstrip("/")
-    return f"{public_url}/{key}"
+def upload_image(data: ImageData, content_type: str = "image/jpeg", prefix: str = "plants") -> str:
+    """Upload image bytes or a binary file object to storage, return its public URL.
+
+    Nothing is sent when an object with the same content is already stored.
+    """
+    key = content_key(data, content_type, prefix)
+    _put_missing(key, data, content_type)
+    return get_backend().public_url(key)
+
+def upload_image_bytes(image_bytes: bytes, content_type: str = "image/jpeg", prefix: str = "plants") -> str:
+    """Upload raw image bytes to storage, return its public URL."""
+    return upload_image(image_bytes, content_type, prefix)
 
 def upload_base64_image(b64_data: str, prefix: str = "plants") -> str:
-    """Upload a base64 image string to R2, return its public URL."""
+    """Upload a base64 image string to storage, return its public URL."""
     if "," in b64_data:
         header, b64_data = b64_data.split(",", 1)
         content_type = "image/jpeg"
@@ -45,13 +277,64 @@ def upload_base64_image(b64_data: str, prefix: str = "plants") -> str:
     else:
         content_type = "image/jpeg"
 
-    return upload_image_bytes(base64.b64decode(b64_data), content_type, prefix)
+    # Decode in 4-character aligned chunks into a spooled file instead of
+    # materialising the whole decoded image in memory.
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as buf:
+        chunk = 4 * 64 * 1024
+        for i in range(0, len(b64_data), chunk):
+            buf.write(binascii.a2b_base64(b64_data[i:i + chunk]))
+        return upload_image(buf, content_type, prefix)
 
 def delete_image(url: str):
-    """Delete an image from R2 given its public URL."""
-    public_url = os.getenv("R2_PUBLIC_URL", "").rstrip("/")
-    bucket = os.getenv("R2_BUCKET_NAME")
-    if not url.startswith(public_url):
-        return
-    key = url[len(public_url) + 1:]
-    _client().delete_object(Bucket=bucket, Key=key)
+    """Delete an image from storage given its public URL.
+
+    Ignores reference counts: images of plants are removed through
+    ``deletion.enqueue`` so shared objects survive.
+    """
+    backend = get_backend()
+    key = backend.key_from_url(url)
+    if key is not None:
+        backend.delete(key)
+
+
+async def _upload_referenced(db, data: ImageData, content_type: str, prefix: str) -> str:
+    loop = asyncio.get_running_loop()
+    pool = get_executor()
+    key = await loop.run_in_executor(pool, content_key, data, content_type, prefix)
+    known_stored = await image_refs.acquire(db, key)
+    try:
+        await loop.run_in_executor(pool, _put_missing, key, data, content_type, known_stored)
+        if not known_stored:
+            await image_refs.mark_stored(db, key)
+    except BaseException:
+        await image_refs.abandon(db, key)
+        raise
+    return get_backend().public_url(key)
+
+
+async def upload_images(
+    images: Iterable[Tuple[ImageData, str]], prefix: str = "plants", db=None
+) -> List[str]:
+    """Upload all images in parallel on the shared pool, return their URLs in order.
+
+    With ``db`` every image also takes a reference in ``db.image_refs``; the
+    caller releases it through the deletion outbox when the plant goes away.
+    """
+    if db is not None:
+        return list(await asyncio.gather(*[
+            _upload_referenced(db, data, content_type, prefix) for data, content_type in images
+        ]))
+    loop = asyncio.get_running_loop()
+    pool = get_executor()
+    return list(await asyncio.gather(*[
+        loop.run_in_executor(pool, upload_image, data, content_type, prefix)
+        for data, content_type in images
+    ]))
+
+
+async def delete_images(urls: Iterable[str]):
+    """Delete all images behind ``urls`` with as few storage round trips as possible."""
+    backend = get_backend()
+    keys = [k for k in (backend.key_from_url(u) for u in urls) if k is not None]
+    if keys:
+        await asyncio.get_running_loop().run_in_executor(get_executor(), backend.delete_many, keys)
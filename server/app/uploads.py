@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import io
+import os
+from typing import BinaryIO, List
+
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+
+MAX_IMAGES = int(os.getenv("UPLOAD_MAX_IMAGES", "5"))
+MAX_IMAGE_BYTES = int(os.getenv("UPLOAD_MAX_IMAGE_BYTES", str(15 * 1024 * 1024)))
+MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(50 * 1024 * 1024)))
+MAX_IMPORT_BYTES = int(os.getenv("IMPORT_MAX_REQUEST_BYTES", str(200 * 1024 * 1024)))
+# Paths whose request bodies are capped by UploadLimitMiddleware
+LIMITED_PATHS = ("/api/identify-plant",)
+IMPORT_PATHS = ("/api/my-plants/import",)
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class SpooledImage:
+    """One uploaded image, kept in its spooled temp file and shared by every stage.
+
+    Starlette already spools multipart files to disk past 1 MB, so the image is
+    never held in RAM as a whole. The same file object is handed to the
+    renderer and to storage; both rewind it before reading.
+    """
+
+    def __init__(self, file: BinaryIO, content_type: str, size: int, digest: str):
+        self.file = file
+        self.content_type = content_type
+        self.size = size
+        self.digest = digest
+
+    def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self.file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def _hash_file(file: BinaryIO) -> tuple[int, str]:
+    file.seek(0)
+    h = hashlib.sha256()
+    size = 0
+    while chunk := file.read(_CHUNK_SIZE):
+        size += len(chunk)
+        if size > MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail="Image too large")
+        h.update(chunk)
+    file.seek(0)
+    return size, h.hexdigest()
+
+
+async def spool_uploads(uploads: List[UploadFile]) -> List[SpooledImage]:
+    """Validate uploaded images and take ownership of their spooled files.
+
+    FastAPI closes form files once the handler returns; detaching them here
+    lets background jobs keep using the data without copying it.
+    """
+    if len(uploads) > MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IMAGES} images are allowed")
+    images: List[SpooledImage] = []
+    try:
+        for upload in uploads:
+            if upload.size is not None and upload.size > MAX_IMAGE_BYTES:
+                raise HTTPException(status_code=413, detail="Image too large")
+            size, digest = await asyncio.to_thread(_hash_file, upload.file)
+            images.append(SpooledImage(upload.file, upload.content_type or "image/jpeg", size, digest))
+            upload.file = io.BytesIO()
+    except BaseException:
+        close_all(images)
+        raise
+    return images
+
+
+def close_all(images: List[SpooledImage]):
+    for img in images:
+        img.close()
+
+
+class UploadLimitMiddleware:
+    """Reject upload requests whose body exceeds ``max_bytes`` while it streams in."""
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BYTES, paths=LIMITED_PATHS):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                response = JSONResponse({"detail": "Request body too large"}, status_code=413)
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+
+import pytest
+
+from server.app import clients
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(clients, "_registry", [])
+
+
+class Thing:
+    name = "real"
+
+    def __getitem__(self, key):
+        return f"item-{key}"
+
+
+def test_lazy_client_builds_once_on_first_use():
+    built = []
+    client = clients.LazyClient("thing", lambda: built.append(1) or Thing())
+    assert not client.built and built == []
+    assert client.name == "real"
+    assert client["x"] == "item-x"
+    assert client.built and built == [1]
+
+
+def test_lazy_client_override():
+    client = clients.LazyClient("thing", Thing)
+    fake = Thing()
+    fake.name = "fake"
+    client.override(fake)
+    assert client.name == "fake"
+    client.override(None)
+    assert not client.built
+    assert client.name == "real"
+
+
+def test_warm_all_builds_registered_clients():
+    client = clients.LazyClient("thing", Thing)
+    timings = asyncio.run(clients.warm_all())
+    assert client.built
+    assert set(timings) == {"thing"}
+
+
+def test_warm_all_logs_failures_and_builds_lazily_later(caplog):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("no network")
+        return Thing()
+
+    client = clients.LazyClient("flaky", flaky)
+    with caplog.at_level(logging.WARNING, logger=clients.__name__):
+        timings = asyncio.run(clients.warm_all())
+    assert "flaky" in timings
+    assert "warming flaky failed" in caplog.text
+    assert not client.built
+    assert client.name == "real"
+
+
+def test_warm_all_abandons_slow_steps(monkeypatch, caplog):
+    monkeypatch.setattr(clients, "WARM_TIMEOUT_SECONDS", 0.01)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with caplog.at_level(logging.WARNING, logger=clients.__name__):
+        timings = asyncio.run(clients.warm_all({"slow": slow}))
+    assert timings["slow"] < 0.5
+    assert "warming slow failed" in caplog.text
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from server.app import deps
+
+
+@pytest.fixture(autouse=True)
+def keys(monkeypatch):
+    monkeypatch.setenv("JWT_SECRET", "new-secret")
+    monkeypatch.setenv("JWT_PREVIOUS_SECRETS", "old-secret")
+    deps.load_keys()
+    yield
+    deps.load_keys()
+
+
+def make_request(token=None, cookie=None):
+    headers = []
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    if cookie:
+        headers.append((b"cookie", f"access_token={cookie}".encode()))
+    return Request({"type": "http", "headers": headers})
+
+
+def current_user(request):
+    return asyncio.run(deps.get_current_user(request))
+
+
+def test_bearer_token_is_verified_once(monkeypatch):
+    token = deps.issue_token({"sub": "user1", "exp": time.time() + 60})
+    calls = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(jwt, "decode", lambda *a, **k: calls.append(1) or real_decode(*a, **k))
+    assert current_user(make_request(token))["sub"] == "user1"
+    assert current_user(make_request(cookie=token))["sub"] == "user1"
+    assert len(calls) == 1
+
+
+def test_token_signed_with_previous_secret_is_accepted():
+    token = jwt.encode({"sub": "user1", "exp": time.time() + 60}, "old-secret", algorithm="HS256")
+    assert current_user(make_request(token))["sub"] == "user1"
+
+
+def test_unknown_secret_and_expired_tokens_are_rejected():
+    forged = jwt.encode({"sub": "user1", "exp": time.time() + 60}, "other", algorithm="HS256")
+    expired = deps.issue_token({"sub": "user1", "exp": time.time() - 1})
+    for token in (forged, expired, None):
+        with pytest.raises(HTTPException) as exc:
+            current_user(make_request(token))
+        assert exc.value.status_code == 401
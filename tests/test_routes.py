@@ -1,15 +1,148 @@
+import csv
+import hashlib
+import re
+import io
+import json
 import types
 import os
+import time
+from datetime import datetime
 import pytest
 from fastapi.testclient import TestClient
+from PIL import Image
 
 os.environ.setdefault("PLANT_ID_API_KEY", "test")
 
-from server.app import routes, main, deps
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from server.app import routes, main, deps, identify_cache, storage, uploads, species, counters, deletion, http_cache, migrations, search, metrics, ratelimit, image_refs, images
+
+def _matches(doc, query):
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(_matches(doc, q) for q in cond):
+                return False
+            continue
+        if key == "$text":
+            # Crude stand-in for Mongo's text index
+            text = f"{doc.get('search_names', '')} {doc.get('notes') or ''}".lower()
+            if not any(w in text.split() for w in cond["$search"].lower().split()):
+                return False
+            continue
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            for op, arg in cond.items():
+                if op == "$lt" and not (value is not None and value < arg):
+                    return False
+                if op == "$gt" and not (value is not None and value > arg):
+                    return False
+                if op == "$in" and value not in arg:
+                    return False
+                if op == "$ne" and value == arg:
+                    return False
+                if op == "$lte" and not (value is not None and value <= arg):
+                    return False
+                if op == "$gte" and not (value is not None and value >= arg):
+                    return False
+                if op == "$exists" and (key in doc) != arg:
+                    return False
+                if op == "$not" and _matches(doc, {key: arg}):
+                    return False
+                if op == "$regex" and not any(re.match(arg, v) for v in (value or [])):
+                    return False
+        elif value != cond and str(value) != str(cond):
+            return False
+    return True
+
+def _apply(doc, update):
+    if isinstance(update, list):  # pipeline update: each $set stage sees the previous one
+        for stage in update:
+            doc.update({k: _eval(doc, expr) for k, expr in stage["$set"].items()})
+        return doc
+    doc.update(update.get("$set", {}))
+    for key, delta in update.get("$inc", {}).items():
+        doc[key] = doc.get(key, 0) + delta
+    return doc
+
+class DummyAsyncIter:
+    def __init__(self, items):
+        self._items = iter(items)
+    def __aiter__(self):
+        return self
+    async def to_list(self, length=None):
+        return [item async for item in self][:length]
+    async def __anext__(self):
+        try:
+            return next(self._items)
+        except StopIteration:
+            raise StopAsyncIteration
+
+def _eval(doc, expr):
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = doc
+        for part in expr[1:].split("."):
+            if isinstance(value, list):
+                value = [v.get(part) for v in value]
+            else:
+                value = (value or {}).get(part)
+        return value
+    if isinstance(expr, dict) and "$arrayElemAt" in expr:
+        array, idx = (_eval(doc, e) for e in expr["$arrayElemAt"])
+        return array[idx] if array and len(array) > idx else None
+    if isinstance(expr, dict) and "$meta" in expr:
+        return 1.0
+    if isinstance(expr, dict) and "$ifNull" in expr:
+        return next((v for v in (_eval(doc, e) for e in expr["$ifNull"]) if v is not None), None)
+    if isinstance(expr, dict) and "$subtract" in expr:
+        a, b = (_eval(doc, e) for e in expr["$subtract"])
+        # Date minus date is milliseconds, as in Mongo
+        return (a - b).total_seconds() * 1000 if isinstance(a, datetime) else a - b
+    if isinstance(expr, dict) and "$divide" in expr:
+        a, b = (_eval(doc, e) for e in expr["$divide"])
+        return a / b
+    if isinstance(expr, dict) and "$multiply" in expr:
+        a, b = (_eval(doc, e) for e in expr["$multiply"])
+        return a * b
+    if isinstance(expr, dict) and "$add" in expr:
+        return sum(_eval(doc, e) for e in expr["$add"])
+    if isinstance(expr, dict) and "$min" in expr:
+        return min(_eval(doc, e) for e in expr["$min"])
+    if isinstance(expr, dict) and "$gte" in expr:
+        a, b = (_eval(doc, e) for e in expr["$gte"])
+        return a >= b
+    if isinstance(expr, dict) and "$cond" in expr:
+        cond, then, otherwise = expr["$cond"]
+        return _eval(doc, then) if _eval(doc, cond) else _eval(doc, otherwise)
+    return expr
+
+def _project(doc, projection):
+    if not projection or not any(isinstance(v, dict) for v in projection.values()):
+        return doc
+    out = {"_id": doc.get("_id")}
+    for key, expr in projection.items():
+        out[key] = doc.get(key) if expr == 1 else _eval(doc, expr)
+    return out
 
 class DummyCursor:
     def __init__(self, docs):
         self._docs = docs
+    def __aiter__(self):
+        return DummyAsyncIter(self._docs)
+    def to_docs(self):
+        return self._docs
+    def sort(self, key, direction=1):
+        if isinstance(key, list):  # e.g. a textScore sort
+            return self
+        if all(key in d for d in self._docs):
+            self._docs = sorted(self._docs, key=lambda d: d[key], reverse=direction < 0)
+        return self
+    def skip(self, n):
+        self._docs = self._docs[n:]
+        return self
+    def limit(self, n):
+        self._docs = self._docs[:n]
+        return self
     async def to_list(self, length):
         return self._docs[:length]
 
@@ -17,18 +150,71 @@ class DummyPlants:
     def __init__(self, docs=None):
         self.docs = docs or []
     async def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        if any(d["_id"] == doc["_id"] for d in self.docs):
+            raise DuplicateKeyError("duplicate key")
         self.docs.append(doc)
-        return types.SimpleNamespace(inserted_id="1")
-    def find(self, query):
-        return DummyCursor(self.docs)
-    async def update_one(self, filter_, update):
-        matched = 1 if self.docs else 0
-        return types.SimpleNamespace(matched_count=matched)
+        return types.SimpleNamespace(inserted_id=doc["_id"])
+    def find(self, query, projection=None):
+        return DummyCursor([_project(d, projection) for d in self.docs if _matches(d, query)])
+    async def find_one(self, filter_, projection=None):
+        for d in self.docs:
+            if _matches(d, filter_):
+                return d
+        return None
+    async def update_one(self, filter_, update, upsert=False):
+        existing = await self.find_one(filter_)
+        if existing is not None:
+            _apply(existing, update)
+        elif upsert:
+            self.docs.append(_apply({"_id": filter_.get("_id")}, update))
+        return types.SimpleNamespace(matched_count=int(existing is not None))
+    async def insert_many(self, docs, ordered=True):
+        ids = [(await self.insert_one(doc)).inserted_id for doc in docs]
+        return types.SimpleNamespace(inserted_ids=ids)
+    async def update_many(self, filter_, update):
+        matched = [d for d in self.docs if _matches(d, filter_)]
+        for d in matched:
+            _apply(d, update)
+        return types.SimpleNamespace(matched_count=len(matched))
+    async def delete_many(self, filter_):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not _matches(d, filter_)]
+        return types.SimpleNamespace(deleted_count=before - len(self.docs))
+    async def find_one_and_update(self, filter_, update, upsert=False, return_document=None, projection=None):
+        existing = await self.find_one(filter_)
+        if existing is None:
+            if not upsert:
+                return None
+            if any(d["_id"] == filter_.get("_id") for d in self.docs):
+                raise DuplicateKeyError("duplicate key")
+            on_insert = {} if isinstance(update, list) else update.get("$setOnInsert", {})
+            existing = {"_id": filter_.get("_id"), **on_insert}
+            self.docs.append(existing)
+            before = None
+        else:
+            before = dict(existing)
+        _apply(existing, update)
+        return before if return_document is ReturnDocument.BEFORE else existing
+    async def count_documents(self, query):
+        return len([d for d in self.docs if _matches(d, query)])
+    def aggregate(self, pipeline):
+        counts = {}
+        for d in self.docs:
+            counts[d.get("user_id")] = counts.get(d.get("user_id"), 0) + 1
+        return DummyAsyncIter([{"_id": k, "n": v} for k, v in counts.items()])
     async def delete_one(self, filter_):
         before = len(self.docs)
         self.docs = [d for d in self.docs if str(d.get("_id")) != str(filter_.get("_id"))]
         deleted = before - len(self.docs)
         return types.SimpleNamespace(deleted_count=deleted)
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            existing = await self.find_one(op._filter)
+            if existing is not None:
+                existing.update(op._doc.get("$set", {}))
+            elif op._upsert:
+                self.docs.append({**op._filter, **op._doc.get("$set", {})})
     async def create_index(self, *args, **kwargs):
         pass
 
@@ -44,6 +230,53 @@ class DummyDB:
     def __init__(self, docs=None):
         self.client = DummyClient()
         self.plants = DummyPlants(docs)
+        self.identification_cache = DummyPlants()
+        self.species = DummyPlants()
+        self.user_stats = DummyPlants()
+        self.deletion_outbox = DummyPlants()
+        self.rate_limits = DummyPlants()
+        self.image_refs = DummyPlants()
+
+def jpeg_bytes(size=(800, 600), color=(20, 120, 40)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+def fake_identification():
+    suggestion = types.SimpleNamespace(
+        id="abc",
+        name="ficus lyrata",
+        probability=0.9,
+        details={"common_names": ["fiddle-leaf fig"], "description": {"value": "A fig."}},
+        similar_images=[],
+    )
+    return types.SimpleNamespace(
+        access_token="tok",
+        status=types.SimpleNamespace(name="COMPLETED"),
+        result=types.SimpleNamespace(
+            is_plant=types.SimpleNamespace(binary=True, probability=0.99),
+            classification=types.SimpleNamespace(suggestions=[suggestion]),
+        ),
+        input=types.SimpleNamespace(datetime=datetime(2024, 1, 1), latitude=1.0, longitude=2.0),
+    )
+
+class FakePlantApi:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+    def identify(self, images, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        return fake_identification()
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    identify_cache.identification_cache.clear()
+    species.clear_cache()
+    counters.clear_cache()
+    http_cache.clear_cache()
+    ratelimit.clear()
+    yield
 
 @pytest.fixture
 def client(monkeypatch):
@@ -100,3 +333,714 @@ def test_delete_plant_not_found(client, monkeypatch):
     main.app.dependency_overrides.clear()
     assert resp.status_code == 404
 
+
+@pytest.fixture
+def local_storage(tmp_path):
+    backend = storage.LocalBackend(str(tmp_path), "https://cdn.example.com")
+    storage.set_backend(backend)
+    yield backend
+    storage.set_backend(None)
+
+@pytest.fixture
+def fake_plant_api(monkeypatch, local_storage):
+    api = FakePlantApi()
+    monkeypatch.setattr(routes, "plant_client", api)
+    return api
+
+def test_app_imports_without_plant_id_key():
+    import subprocess, sys
+    env = {k: v for k, v in os.environ.items() if k != "PLANT_ID_API_KEY"}
+    result = subprocess.run(
+        [sys.executable, "-c", "import server.app.main; from server.app import routes; print(routes.plant_client.built)"],
+        env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "False"
+
+def test_identify_plant_without_plant_id_key_returns_502(client, local_storage, monkeypatch):
+    monkeypatch.delenv("PLANT_ID_API_KEY", raising=False)
+    monkeypatch.setattr(routes, "plant_client", routes.LazyClient("plant_id", routes._plant_api, register=False))
+    resp = client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))])
+    assert resp.status_code == 502
+
+def test_create_app_builds_a_working_app(monkeypatch):
+    db = DummyDB()
+    monkeypatch.setattr(routes, "db", db)
+    monkeypatch.setattr(main, "db", db)
+    app = main.create_app()
+    assert app is not main.app
+    app.dependency_overrides[deps.get_current_user] = lambda: {"sub": "user1", "email": "test@example.com"}
+    with TestClient(app) as c:
+        assert c.get("/api/my-plants/count").json() == {"count": 0}
+
+def test_identify_plant(client, fake_plant_api):
+    resp = client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))])
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["suggestions"][0]["name"] == "Ficus Lyrata"
+    assert len(data["image_urls"]) == 1
+    assert data["image_urls"][0].startswith("https://cdn.example.com/plants/")
+    assert fake_plant_api.calls == 1
+
+def test_identify_plant_background_job(client, fake_plant_api):
+    resp = client.post(
+        "/api/identify-plant?background=true",
+        files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))],
+    )
+    assert resp.status_code == 202
+    job_id = resp.json()["job_id"]
+    for _ in range(50):
+        job = client.get(f"/api/identify-plant/{job_id}").json()
+        if job["status"] != "pending":
+            break
+        time.sleep(0.02)
+    assert job["status"] == "completed"
+    assert job["result"]["suggestions"][0]["id"] == "abc"
+
+def test_identify_job_not_found(client):
+    resp = client.get("/api/identify-plant/missing")
+    assert resp.status_code == 404
+
+def test_identify_plant_resubmission_uses_cache(client, fake_plant_api):
+    files = [("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))]
+    first = client.post("/api/identify-plant", files=files)
+    second = client.post("/api/identify-plant", files=files)
+    assert first.status_code == second.status_code == 200
+    assert first.json()["suggestions"] == second.json()["suggestions"]
+    assert fake_plant_api.calls == 1
+
+def test_identify_plant_cache_hit_gets_its_own_date_and_token(client, fake_plant_api):
+    files = [("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))]
+    first = client.post("/api/identify-plant", files=files).json()
+    time.sleep(0.01)
+    second = client.post("/api/identify-plant", files=files).json()
+    assert fake_plant_api.calls == 1
+    assert first["datetime"] != second["datetime"]
+    assert first["access_token"] == second["access_token"] == "tok"
+    main.app.dependency_overrides[deps.get_current_user] = lambda: {"sub": "user2", "email": "b@example.com"}
+    other = client.post("/api/identify-plant", files=files).json()
+    assert fake_plant_api.calls == 1
+    assert other["suggestions"] == first["suggestions"]
+    assert other["access_token"] is None
+
+def test_identification_cache_coalesces_concurrent_requests():
+    import asyncio
+    cache = identify_cache.IdentificationCache()
+    db = DummyDB()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"access_token": "tok"}
+
+    async def run():
+        key = identify_cache.cache_key(["digest"], None, None, ["url"])
+        return await asyncio.gather(*[cache.get_or_compute(db, key, compute) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r == {"access_token": "tok"} for r in results)
+
+def test_identification_cache_follower_survives_leader_cancellation():
+    import asyncio
+    cache = identify_cache.IdentificationCache()
+    db = DummyDB()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"access_token": "tok"}
+
+    async def run():
+        key = identify_cache.cache_key(["digest"], None, None, ["url"])
+        leader = asyncio.ensure_future(cache.get_or_compute(db, key, compute))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(cache.get_or_compute(db, key, compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == {"access_token": "tok"}
+    assert len(calls) == 2
+
+def test_delete_plant_removes_images(client, local_storage):
+    url = storage.upload_image_bytes(b"img")
+    path = local_storage.root / local_storage.key_from_url(url)
+    assert path.exists()
+    routes.db.plants.docs[0]["image_urls"] = [url]
+    resp = client.delete("/api/delete-plant/507f1f77bcf86cd799439011")
+    assert resp.status_code == 200
+    for _ in range(50):
+        if not path.exists() and not routes.db.deletion_outbox.docs:
+            break
+        time.sleep(0.02)
+    assert not path.exists()
+    assert routes.db.deletion_outbox.docs == []
+
+def _wait_for_outbox(db):
+    for _ in range(50):
+        if not db.deletion_outbox.docs:
+            return
+        time.sleep(0.02)
+
+def test_identify_plant_deduplicates_images(client, fake_plant_api, local_storage):
+    photo = jpeg_bytes()
+    plants = [
+        client.post("/api/identify-plant", files=[("images", ("a.jpg", photo, "image/jpeg"))]).json()
+        for _ in range(2)
+    ]
+    assert plants[0]["image_urls"] == plants[1]["image_urls"]
+    assert plants[0]["image_urls"][0].endswith(f"/plants/{hashlib.sha256(photo).hexdigest()}.jpg")
+    files = [p for p in local_storage.root.rglob("*") if p.is_file()]
+    assert len(files) == 3  # original, medium, thumbnail
+    assert [d["count"] for d in routes.db.image_refs.docs] == [2, 2, 2]
+
+    client.delete(f"/api/delete-plant/{plants[0]['id']}")
+    _wait_for_outbox(routes.db)
+    assert all(f.exists() for f in files)
+    assert [d["count"] for d in routes.db.image_refs.docs] == [1, 1, 1]
+
+    client.delete(f"/api/delete-plant/{plants[1]['id']}")
+    _wait_for_outbox(routes.db)
+    assert not any(f.exists() for f in files)
+    assert routes.db.image_refs.docs == []
+
+def test_identify_plant_releases_images_when_an_upload_fails(client, fake_plant_api, local_storage, monkeypatch):
+    put = local_storage.put
+    def failing_put(key, data, content_type):
+        if key.startswith("plants/thumbnail/"):
+            raise OSError("storage down")
+        put(key, data, content_type)
+    monkeypatch.setattr(local_storage, "put", failing_put)
+    with pytest.raises(OSError):
+        client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))])
+    _wait_for_outbox(routes.db)
+    assert routes.db.image_refs.docs == []
+    assert not [p for p in local_storage.root.rglob("*") if p.is_file()]
+
+def test_identify_plant_releases_images_when_insert_fails(client, fake_plant_api, local_storage, monkeypatch):
+    async def failing_insert(doc):
+        raise RuntimeError("mongo down")
+    monkeypatch.setattr(routes.db.plants, "insert_one", failing_insert)
+    with pytest.raises(RuntimeError):
+        client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))])
+    _wait_for_outbox(routes.db)
+    assert routes.db.image_refs.docs == []
+    assert not [p for p in local_storage.root.rglob("*") if p.is_file()]
+
+def test_image_refs_claim_skips_referenced_keys():
+    import asyncio
+    db = DummyDB()
+    assert asyncio.run(image_refs.acquire(db, "plants/a.jpg")) is False
+    asyncio.run(image_refs.mark_stored(db, "plants/a.jpg"))
+    assert asyncio.run(image_refs.acquire(db, "plants/a.jpg")) is True
+    asyncio.run(image_refs.release(db, ["plants/a.jpg"]))
+    # Still referenced once; keys stored before reference counting are claimable
+    assert asyncio.run(image_refs.claim(db, ["plants/a.jpg", "plants/legacy.jpg"])) == ["plants/legacy.jpg"]
+    asyncio.run(image_refs.finish(db, ["plants/legacy.jpg"]))
+    assert [d["_id"] for d in db.image_refs.docs] == ["plants/a.jpg"]
+
+def test_identify_plant_rejects_oversized_image(client, fake_plant_api, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_IMAGE_BYTES", 4)
+    resp = client.post("/api/identify-plant", files=[("images", ("a.jpg", b"too-big", "image/jpeg"))])
+    assert resp.status_code == 413
+    assert fake_plant_api.calls == 0
+
+def test_identify_plant_rejects_oversized_request(client, fake_plant_api):
+    limit = uploads.MAX_REQUEST_BYTES
+    resp = client.post(
+        "/api/identify-plant",
+        files=[("images", ("a.jpg", b"x" * (limit + 1), "image/jpeg"))],
+    )
+    assert resp.status_code == 413
+    assert fake_plant_api.calls == 0
+
+def test_identify_plant_stores_renditions(client, fake_plant_api, local_storage):
+    resp = client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes((2000, 1000)), "image/jpeg"))])
+    assert resp.status_code == 200
+    rendition = resp.json()["renditions"][0]
+    assert rendition["original"] == resp.json()["image_urls"][0]
+    thumb = Image.open(local_storage.root / local_storage.key_from_url(rendition["thumbnail"]))
+    medium = Image.open(local_storage.root / local_storage.key_from_url(rendition["medium"]))
+    assert max(thumb.size) <= 320
+    assert max(medium.size) <= 1500
+
+def test_render_large_image_from_spooled_file(monkeypatch):
+    import asyncio
+    data = jpeg_bytes((2000, 1000))
+    image = uploads.SpooledImage(io.BytesIO(data), "image/jpeg", len(data), "digest")
+    monkeypatch.setattr(images, "PROCESS_MAX_BYTES", len(data) - 1)
+    # Not an executor: rendering through the process pool would fail
+    monkeypatch.setattr(images, "get_pool", lambda: object())
+    rendered = asyncio.run(images.render(image))
+    assert Image.open(io.BytesIO(rendered["medium"])).size == (1500, 750)
+
+def test_identify_plant_rejects_non_image(client, fake_plant_api):
+    resp = client.post("/api/identify-plant", files=[("images", ("a.jpg", b"not an image", "image/jpeg"))])
+    assert resp.status_code == 400
+    assert fake_plant_api.calls == 0
+
+def test_get_plants_cursor_pagination(client, monkeypatch):
+    docs = [{"_id": ObjectId(), "user_id": "user1"} for _ in range(5)]
+    docs.append({"_id": ObjectId(), "user_id": "someone-else"})
+    monkeypatch.setattr(routes, "db", DummyDB(docs))
+    seen = []
+    after = ""
+    while after is not None:
+        data = client.get("/api/my-plants", params={"after": after, "limit": 2}).json()
+        seen.extend(item["id"] for item in data["items"])
+        after = data["next_cursor"]
+    assert seen == [str(d["_id"]) for d in reversed(docs[:5])]
+
+def test_get_plants_page_mode_still_returns_list(client, monkeypatch):
+    docs = [{"_id": ObjectId(), "user_id": "user1"} for _ in range(3)]
+    monkeypatch.setattr(routes, "db", DummyDB(docs))
+    data = client.get("/api/my-plants", params={"page": 2, "limit": 2}).json()
+    assert [item["id"] for item in data] == [str(docs[0]["_id"])]
+
+def test_get_plants_invalid_cursor(client):
+    resp = client.get("/api/my-plants", params={"after": "not-a-cursor"})
+    assert resp.status_code == 400
+
+def test_get_plants_summary_view(client, monkeypatch):
+    doc = {
+        "_id": ObjectId(),
+        "user_id": "user1",
+        "datetime": "2024-01-01 00:00:00",
+        "suggestions": [
+            {"id": "abc", "name": "Ficus Lyrata", "probability": 0.9,
+             "common_names": ["Fiddle-Leaf Fig"], "description": "A long text"},
+            {"id": "def", "name": "Ficus Elastica", "probability": 0.1},
+        ],
+        "image_urls": ["https://cdn.example.com/plants/a.jpg"],
+        "renditions": [{"original": "https://cdn.example.com/plants/a.jpg",
+                        "thumbnail": "https://cdn.example.com/plants/thumbnail/a.jpg"}],
+    }
+    monkeypatch.setattr(routes, "db", DummyDB([doc]))
+    data = client.get("/api/my-plants", params={"view": "summary"}).json()
+    assert data == [{
+        "id": str(doc["_id"]),
+        "name": "Ficus Lyrata",
+        "common_name": "Fiddle-Leaf Fig",
+        "probability": 0.9,
+        "thumbnail_url": "https://cdn.example.com/plants/thumbnail/a.jpg",
+        "datetime": "2024-01-01 00:00:00",
+    }]
+
+def test_get_plant_detail(client):
+    resp = client.get("/api/plants/507f1f77bcf86cd799439011")
+    assert resp.status_code == 200
+    assert resp.json()["id"] == "507f1f77bcf86cd799439011"
+
+def test_get_plant_detail_other_user(client, monkeypatch):
+    monkeypatch.setattr(routes, "db", DummyDB([{"_id": "507f1f77bcf86cd799439011", "user_id": "user2"}]))
+    resp = client.get("/api/plants/507f1f77bcf86cd799439011")
+    assert resp.status_code == 404
+
+def test_identify_plant_stores_species_once(client, fake_plant_api):
+    resp = client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))])
+    assert resp.json()["suggestions"][0]["description"] == "A fig."
+    saved = routes.db.plants.docs[-1]["suggestions"][0]
+    assert "description" not in saved
+    assert saved["id"] == "abc" and saved["probability"] == 0.9
+    assert routes.db.species.docs == [{"_id": "abc", **{
+        k: v for k, v in resp.json()["suggestions"][0].items()
+        if k not in ("id", "probability", "similar_images")
+    }}]
+
+def test_get_plant_joins_species_details(client, monkeypatch):
+    db = DummyDB([{
+        "_id": "507f1f77bcf86cd799439011",
+        "user_id": "user1",
+        "suggestions": [{"id": "abc", "name": "Ficus Lyrata", "probability": 0.9}],
+    }])
+    db.species.docs.append({"_id": "abc", "name": "Ficus Lyrata", "description": "A fig."})
+    monkeypatch.setattr(routes, "db", db)
+    suggestion = client.get("/api/plants/507f1f77bcf86cd799439011").json()["suggestions"][0]
+    assert suggestion["description"] == "A fig."
+    assert suggestion["probability"] == 0.9
+
+def test_plant_count_tracks_inserts_and_deletes(client, fake_plant_api):
+    assert client.get("/api/my-plants/count").json() == {"count": 1}
+    client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))])
+    assert client.get("/api/my-plants/count").json() == {"count": 2}
+    client.delete("/api/delete-plant/507f1f77bcf86cd799439011")
+    assert client.get("/api/my-plants/count").json() == {"count": 1}
+    assert routes.db.user_stats.docs[0]["plant_count"] == 1
+
+def test_first_write_seeds_counter_for_existing_user(client):
+    routes.db.plants.docs.append({"_id": ObjectId(), "user_id": "user1"})
+    # Plants from before counters existed: no user_stats document yet
+    client.delete("/api/delete-plant/507f1f77bcf86cd799439011")
+    assert routes.db.user_stats.docs[0]["plant_count"] == 1
+    counters.clear_cache()
+    assert client.get("/api/my-plants/count").json() == {"count": 1}
+
+def test_plant_count_after_notes_update_creates_stats(client):
+    resp = client.put("/api/update-plant-notes", json={"id": "507f1f77bcf86cd799439011", "notes": "hi"})
+    assert resp.status_code == 200
+    counters.clear_cache()
+    assert client.get("/api/my-plants/count").json() == {"count": 1}
+
+def test_plant_count_follows_version_from_other_workers(client):
+    assert client.get("/api/my-plants/count").json() == {"count": 1}
+    # Another worker inserts a plant; this worker only learns the new version
+    routes.db.user_stats.docs[0].update(plant_count=2, version=7)
+    counters._versions.clear()
+    resp = client.get("/api/my-plants/count")
+    assert resp.json() == {"count": 2}
+
+def test_reconcile_repairs_drift():
+    import asyncio
+    db = DummyDB([{"_id": "1", "user_id": "user1"}, {"_id": "2", "user_id": "user1"}])
+    db.user_stats.docs = [
+        {"_id": "user1", "plant_count": 7},
+        {"_id": "gone", "plant_count": 3},
+    ]
+    fixed = asyncio.run(counters.reconcile(db))
+    assert fixed == 2
+    assert [(d["_id"], d["plant_count"]) for d in db.user_stats.docs] == [("user1", 2), ("gone", 0)]
+
+def test_reconcile_skips_users_written_while_counting():
+    import asyncio
+    db = DummyDB([{"_id": "1", "user_id": "user1"}])
+    db.user_stats.docs = [{"_id": "user1", "plant_count": 1, "version": 4}]
+    aggregate = db.plants.aggregate
+    def aggregate_then_insert(pipeline):
+        rows = aggregate(pipeline)
+        # An identify lands after the counts were taken
+        db.plants.docs.append({"_id": "2", "user_id": "user1"})
+        db.user_stats.docs[0].update(plant_count=2, version=5)
+        return rows
+    db.plants.aggregate = aggregate_then_insert
+    assert asyncio.run(counters.reconcile(db)) == 0
+    assert db.user_stats.docs[0]["plant_count"] == 2
+
+def test_delete_plants_bulk(client, monkeypatch):
+    mine = [{"_id": ObjectId(), "user_id": "user1", "image_urls": [f"https://cdn.example.com/plants/{i}.jpg"]}
+            for i in range(3)]
+    theirs = {"_id": ObjectId(), "user_id": "user2"}
+    db = DummyDB(mine + [theirs])
+    db.user_stats.docs = [{"_id": "user1", "plant_count": 3}]
+    monkeypatch.setattr(routes, "db", db)
+    monkeypatch.setattr(deletion, "wake", lambda: None)
+    ids = [str(d["_id"]) for d in mine[:2]] + [str(theirs["_id"])]
+    resp = client.post("/api/delete-plants", json={"ids": ids})
+    assert resp.status_code == 200
+    assert resp.json()["ids"] == ids[:2]
+    assert db.plants.docs == [mine[2], theirs]
+    assert db.user_stats.docs[0]["plant_count"] == 1
+    assert [e["urls"] for e in db.deletion_outbox.docs] == [
+        ["https://cdn.example.com/plants/0.jpg", "https://cdn.example.com/plants/1.jpg"]
+    ]
+
+def test_deletion_drain_retries_failures(monkeypatch):
+    import asyncio
+
+    async def failing(urls):
+        raise RuntimeError("R2 unavailable")
+
+    db = DummyDB()
+    monkeypatch.setattr(deletion, "delete_images", failing)
+    asyncio.run(deletion.enqueue(db, ["https://cdn.example.com/plants/a.jpg"]))
+    assert asyncio.run(deletion.drain(db)) == 0
+    entry = db.deletion_outbox.docs[0]
+    assert entry["attempts"] == 1
+    assert entry["last_error"] == "R2 unavailable"
+    assert asyncio.run(deletion.drain(db)) == 0  # backing off, not yet due
+    assert db.deletion_outbox.docs[0]["attempts"] == 1
+
+def test_export_plants_ndjson_and_csv(client, monkeypatch):
+    docs = [{
+        "_id": ObjectId(), "user_id": "user1", "notes": f"note {i}",
+        "suggestions": [{"id": "abc", "name": "Ficus Lyrata", "probability": 0.9}],
+    } for i in range(3)]
+    db = DummyDB(docs + [{"_id": ObjectId(), "user_id": "user2"}])
+    db.species.docs.append({"_id": "abc", "name": "Ficus Lyrata", "common_names": ["Fiddle-Leaf Fig"]})
+    monkeypatch.setattr(routes, "db", db)
+
+    resp = client.get("/api/my-plants/export")
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["notes"] for r in records] == ["note 0", "note 1", "note 2"]
+    assert records[0]["suggestions"][0]["common_names"] == ["Fiddle-Leaf Fig"]
+    assert "user_id" not in records[0]
+
+    rows = list(csv.reader(io.StringIO(client.get("/api/my-plants/export?format=csv").text)))
+    assert rows[0][:3] == ["id", "datetime", "name"]
+    assert rows[1][3] == "Fiddle-Leaf Fig"
+    assert len(rows) == 4
+
+def test_import_plants(client, monkeypatch):
+    db = DummyDB()
+    monkeypatch.setattr(routes, "db", db)
+    lines = [
+        json.dumps({"id": "old", "notes": "a", "suggestions": [
+            {"id": "abc", "name": "Ficus Lyrata", "probability": 0.9, "description": "A fig."}]}),
+        "not json",
+        json.dumps({"notes": "b", "latitude": "north"}),
+        json.dumps({"notes": "c", "image_urls": ["https://cdn.example.com/plants/a.jpg"]}),
+        json.dumps({"notes": "d", "suggestions": None}),
+    ]
+    resp = client.post("/api/my-plants/import", content="\n".join(lines),
+                       headers={"content-type": "application/x-ndjson"})
+    data = resp.json()
+    assert data["imported"] == 3
+    assert [e["line"] for e in data["errors"]] == [2, 3]
+    assert [d["notes"] for d in db.plants.docs] == ["a", "c", "d"]
+    assert all(d["user_id"] == "user1" and d["images_owned"] is False for d in db.plants.docs)
+    # Imports keep their details inline and never write the shared catalog
+    assert db.plants.docs[0]["suggestions"][0]["description"] == "A fig."
+    assert db.species.docs == []
+    assert db.plants.docs[2]["suggestions"] == []
+    assert routes.stored_image_urls(db.plants.docs[1]) == []
+    assert db.user_stats.docs[0]["plant_count"] == 3
+
+def test_get_plants_etag_revalidation(client, monkeypatch):
+    calls = []
+    real_find = routes.db.plants.find
+    monkeypatch.setattr(routes.db.plants, "find", lambda *a, **k: calls.append(1) or real_find(*a, **k))
+    first = client.get("/api/my-plants")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert client.get("/api/my-plants", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/my-plants").json() == first.json()
+    assert len(calls) == 1
+
+    client.put("/api/update-plant-notes", json={"id": "507f1f77bcf86cd799439011", "notes": "hi"})
+    changed = client.get("/api/my-plants", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()[0]["notes"] == "hi"
+
+def test_plant_count_etag_changes_after_identify(client, fake_plant_api):
+    etag = client.get("/api/my-plants/count").headers["etag"]
+    assert client.get("/api/my-plants/count", headers={"If-None-Match": etag}).status_code == 304
+    client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))])
+    resp = client.get("/api/my-plants/count", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.json() == {"count": 2}
+
+def test_identify_plant_stores_geojson_location(client, fake_plant_api):
+    client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))],
+                data={"latitude": "1.0", "longitude": "2.0"})
+    assert routes.db.plants.docs[-1]["location"] == {"type": "Point", "coordinates": [2.0, 1.0]}
+
+def test_get_plants_nearby(client, monkeypatch):
+    pipelines = []
+    doc = {"_id": ObjectId(), "name": "Ficus Lyrata", "latitude": 1.0, "longitude": 2.0, "distance": 12.5}
+    def aggregate(pipeline):
+        pipelines.append(pipeline)
+        return DummyAsyncIter([dict(doc)])
+    monkeypatch.setattr(routes.db.plants, "aggregate", aggregate)
+    resp = client.get("/api/my-plants/nearby", params={"latitude": 1.0, "longitude": 2.0, "radius": 100})
+    assert resp.status_code == 200
+    assert resp.json()[0]["distance"] == 12.5
+    geo_near = pipelines[0][0]["$geoNear"]
+    assert geo_near["near"] == {"type": "Point", "coordinates": [2.0, 1.0]}
+    assert geo_near["maxDistance"] == 100
+    assert geo_near["query"] == {"user_id": "user1"}
+
+def test_get_plants_in_wide_bbox(client, monkeypatch):
+    db = DummyDB([
+        {"_id": ObjectId(), "user_id": "user1", "latitude": 0.0, "longitude": 0.0},
+        {"_id": ObjectId(), "user_id": "user1", "latitude": 0.0, "longitude": 175.0},
+        {"_id": ObjectId(), "user_id": "user1", "latitude": 50.0, "longitude": 0.0},
+    ])
+    monkeypatch.setattr(routes, "db", db)
+    # Wider than 180 degrees: must not be read the short way round
+    resp = client.get("/api/my-plants/nearby", params={"bbox": "-170,-10,170,10"})
+    assert [p["longitude"] for p in resp.json()] == [0.0]
+    world = client.get("/api/my-plants/nearby", params={"bbox": "-180,-90,180,90"})
+    assert world.status_code == 200 and len(world.json()) == 3
+
+def test_get_plants_in_bbox_crossing_antimeridian(client, monkeypatch):
+    db = DummyDB([
+        {"_id": ObjectId(), "user_id": "user1", "latitude": 0.0, "longitude": 175.0},
+        {"_id": ObjectId(), "user_id": "user1", "latitude": 0.0, "longitude": -175.0},
+        {"_id": ObjectId(), "user_id": "user1", "latitude": 0.0, "longitude": 0.0},
+    ])
+    monkeypatch.setattr(routes, "db", db)
+    resp = client.get("/api/my-plants/nearby", params={"bbox": "170,-10,-170,10"})
+    assert sorted(p["longitude"] for p in resp.json()) == [-175.0, 175.0]
+
+def test_get_plants_nearby_requires_point_or_bbox(client):
+    assert client.get("/api/my-plants/nearby").status_code == 400
+    assert client.get("/api/my-plants/nearby", params={"bbox": "1,2,3"}).status_code == 400
+
+def test_backfill_locations(monkeypatch):
+    import asyncio
+    db = DummyDB([
+        {"_id": "1", "latitude": 1.0, "longitude": 2.0},
+        {"_id": "2", "latitude": 5.0, "longitude": 6.0, "location": {"type": "Point", "coordinates": [6.0, 5.0]}},
+        {"_id": "3"},
+    ])
+    real_find = db.plants.find
+    # The fake does not understand $exists/$type, so emulate the filter here
+    monkeypatch.setattr(db.plants, "find", lambda query, projection=None: DummyCursor(
+        [d for d in real_find({}).to_docs() if "location" not in d and "latitude" in d]))
+    assert asyncio.run(migrations.backfill_locations(db)) == 1
+    assert db.plants.docs[0]["location"] == {"type": "Point", "coordinates": [2.0, 1.0]}
+
+def test_search_fields_normalize_names():
+    fields = search.search_fields([{"name": "Epipremnum Aureum", "common_names": ["Pothós"], "synonyms": ["Scindapsus aureus"]}])
+    assert fields["search_names"] == "Epipremnum Aureum Pothós Scindapsus aureus"
+    assert {"epipremnum aureum", "epipremnum", "aureum", "pothos", "scindapsus"} <= set(fields["search_keys"])
+    assert search.prefix_query("Epipremnum  au") == {"$regex": "^epipremnum\\ au"}
+    assert search.prefix_query("!!") is None
+
+def test_identify_plant_stores_search_fields(client, fake_plant_api):
+    client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))])
+    doc = routes.db.plants.docs[-1]
+    assert doc["search_names"] == "Ficus Lyrata Fiddle-Leaf Fig"
+    assert "fiddle" in doc["search_keys"] and "ficus lyrata" in doc["search_keys"]
+
+def test_search_and_autocomplete(client):
+    routes.db.plants.docs.extend([
+        {"_id": ObjectId(), "user_id": "user1", "notes": "needs bright light",
+         **search.search_fields([{"name": "Ficus Lyrata", "common_names": ["fiddle-leaf fig"]}])},
+        {"_id": ObjectId(), "user_id": "user1", "notes": "by the ficus",
+         **search.search_fields([{"name": "Monstera Deliciosa"}])},
+        {"_id": ObjectId(), "user_id": "user2",
+         **search.search_fields([{"name": "Ficus Elastica"}])},
+    ])
+    resp = client.get("/api/my-plants/search", params={"q": "ficus"})
+    assert resp.status_code == 200
+    assert len(resp.json()) == 2
+    resp = client.get("/api/my-plants/autocomplete", params={"q": "Fidd"})
+    assert [p["id"] for p in resp.json()] == [str(routes.db.plants.docs[1]["_id"])]
+    assert client.get("/api/my-plants/autocomplete", params={"q": "ficus e"}).json() == []
+
+def test_backfill_search():
+    import asyncio
+    db = DummyDB([{"_id": "1", "suggestions": [{"id": "s1", "name": "Ficus Lyrata"}]}])
+    db.species.docs.append({"_id": "s1", "synonyms": ["Ficus pandurata"]})
+    assert asyncio.run(migrations.backfill_search(db)) == 1
+    assert "pandurata" in db.plants.docs[0]["search_keys"]
+
+def test_identify_plant_server_timing_and_metrics(client, fake_plant_api):
+    resp = client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))])
+    timing = resp.headers["server-timing"]
+    for stage in ("read_uploads", "render", "plant_id", "suggestions", "upload", "db_insert", "total"):
+        assert f"{stage};dur=" in timing
+    body = client.get("/api/metrics").text
+    assert 'stage_duration_seconds_count{stage="plant_id"}' in body
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/identify-plant",status="200"}' in body
+    assert "identify_in_flight 0" in body
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+def test_mongo_command_listener_counts():
+    listener = metrics.MongoCommandListener()
+    before = metrics.mongo_commands.value("find", "ok")
+    listener.succeeded(types.SimpleNamespace(command_name="find", duration_micros=1500))
+    assert metrics.mongo_commands.value("find", "ok") == before + 1
+
+def test_spa_static_files_precompressed_and_cached(tmp_path):
+    from starlette.applications import Starlette
+    from server.app import static
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_text("<html>" + "x" * 2000 + "</html>")
+    (tmp_path / "assets" / "index-BX3f9a_c.js").write_text("console.log(1);" * 200)
+    (tmp_path / "assets" / "vendor-D-6rF2xP.css").write_text("a{}")
+    (tmp_path / "plant-background.png").write_bytes(b"png")
+    assert static.precompress(str(tmp_path)) >= 2
+    assert (tmp_path / "assets" / "index-BX3f9a_c.js.gz").exists()
+    app = Starlette()
+    app.mount("/", static.SPAStaticFiles(directory=str(tmp_path), html=True))
+    with TestClient(app) as c:
+        resp = c.get("/assets/index-BX3f9a_c.js", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["content-encoding"] == "gzip"
+        assert resp.headers["cache-control"] == static.IMMUTABLE
+        assert resp.headers["content-type"].startswith("text/javascript")
+        assert resp.text == "console.log(1);" * 200
+        # Rollup's base64url hashes may contain dashes
+        assert c.get("/assets/vendor-D-6rF2xP.css").headers["cache-control"] == static.IMMUTABLE
+        public = c.get("/plant-background.png")
+        assert public.headers["cache-control"] == "no-cache"
+        page = c.get("/plants/123", headers={"Accept-Encoding": "gzip"})
+        assert page.status_code == 200 and page.headers["content-encoding"] == "gzip"
+        assert page.headers["cache-control"] == "no-cache"
+        again = c.get("/", headers={"If-None-Match": page.headers["etag"]})
+        assert again.status_code == 304
+
+def test_api_responses_are_gzipped(client):
+    resp = client.get("/api/metrics", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+
+def test_trusted_dump_matches_validated_model():
+    from server.app import serialization
+    from server.app.models import PlantResponse
+    doc = {
+        "_id": ObjectId(), "id": "x", "user_id": "user1", "search_keys": ["ficus"],
+        "suggestions": [{"id": "abc", "name": "Ficus", "probability": 0.9,
+                         "url": "https://en.wikipedia.org/wiki/Ficus",
+                         "similar_images": [{"url": "https://plant.id/a.jpg", "similarity": 0.5}]}],
+        "renditions": [{"original": "o", "medium": "m", "thumbnail": "t"}],
+    }
+    expected = PlantResponse(**doc).model_dump(mode="json")
+    assert serialization.trusted_dump(PlantResponse, doc) == expected
+    assert json.loads(serialization.dumps([PlantResponse(**doc)])) == [expected]
+
+def test_identify_plant_user_rate_limit(client, fake_plant_api, monkeypatch):
+    monkeypatch.setattr(ratelimit, "USER_BURST", 2)
+    files = [("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))]
+    assert client.post("/api/identify-plant", files=files).status_code == 200
+    assert client.post("/api/identify-plant", files=files).status_code == 200
+    resp = client.post("/api/identify-plant", files=files)
+    assert resp.status_code == 429
+    assert int(resp.headers["retry-after"]) >= 1
+    assert fake_plant_api.calls == 1  # the second request was a cache hit
+
+def test_identify_plant_sheds_load_when_queue_is_full(client, fake_plant_api, monkeypatch):
+    monkeypatch.setattr(ratelimit, "MAX_QUEUED", 2)
+    monkeypatch.setattr(routes.identification_engine, "queued", 2)
+    resp = client.post("/api/identify-plant", files=[("images", ("a.jpg", jpeg_bytes(), "image/jpeg"))])
+    assert resp.status_code == 429
+    assert "retry-after" in resp.headers
+    assert fake_plant_api.calls == 0
+
+def test_memory_bucket_refills(monkeypatch):
+    import asyncio
+    now = [100.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    store = ratelimit.MemoryBucketStore()
+    take = lambda: asyncio.run(store.take(None, "k", capacity=1, rate=0.5))
+    assert take() == 0
+    assert take() == 2.0
+    now[0] += 2
+    assert take() == 0
+    # Full again: the bucket is dropped instead of kept forever
+    now[0] += 2
+    assert "k" not in store._buckets
+
+def test_mongo_bucket_store_refills_and_takes_in_one_update(monkeypatch):
+    import asyncio
+    from datetime import timedelta, timezone
+    db = DummyDB()
+    now = [datetime(2024, 1, 1, tzinfo=timezone.utc)]
+    monkeypatch.setattr(ratelimit, "datetime", types.SimpleNamespace(now=lambda tz=None: now[0]))
+    calls = []
+    update = db.rate_limits.find_one_and_update
+    async def counted(*args, **kwargs):
+        calls.append(args)
+        return await update(*args, **kwargs)
+    monkeypatch.setattr(db.rate_limits, "find_one_and_update", counted)
+    store = ratelimit.MongoBucketStore()
+    take = lambda: asyncio.run(store.take(db, "identify:user:u1", capacity=2, rate=0.5))
+    assert take() == 0 and take() == 0  # new bucket starts full
+    assert take() == 2.0
+    now[0] += timedelta(seconds=1)
+    assert take() == 1.0  # half a token refilled, still short
+    now[0] += timedelta(seconds=1)
+    assert take() == 0
+    assert db.rate_limits.docs[0]["tokens"] == 0
+    now[0] += timedelta(seconds=60)
+    assert take() == 0
+    assert db.rate_limits.docs[0]["tokens"] == 1  # refill is capped at capacity
+    assert len(calls) == 6  # one round trip per take
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from server.app import storage
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = storage.LocalBackend(str(tmp_path), "https://cdn.example.com")
+    storage.set_backend(backend)
+    yield backend
+    storage.set_backend(None)
+
+
+def test_upload_images_keeps_order(backend):
+    images = [(f"img-{i}".encode(), "image/png") for i in range(5)]
+    urls = asyncio.run(storage.upload_images(images))
+    assert len(urls) == 5
+    for url, (data, _) in zip(urls, images):
+        assert url.endswith(".png")
+        assert (backend.root / backend.key_from_url(url)).read_bytes() == data
+
+
+def test_delete_images_ignores_foreign_urls(backend):
+    url = storage.upload_image_bytes(b"img")
+    asyncio.run(storage.delete_images([url, "https://elsewhere.example.com/plants/x.jpg"]))
+    assert not (backend.root / backend.key_from_url(url)).exists()
+
+
+def test_local_backend_rejects_path_traversal(backend):
+    with pytest.raises(ValueError):
+        backend.put("../escape.jpg", b"img", "image/jpeg")
+
+
+def test_incomplete_backend_fails_on_construction():
+    class NoDelete(storage.StorageBackend):
+        def put(self, key, data, content_type):
+            pass
+
+    with pytest.raises(TypeError):
+        NoDelete()